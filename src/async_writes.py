@@ -0,0 +1,161 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from db_setup import enable_sqlite_savepoints, get_pool_options, get_table
+from incremental import write_frame
+from metrics import log_event, track_stage, profile_stage, clear_rejects, enable_profiling
+from contextlib import contextmanager
+import importlib.util
+import importlib
+import argparse
+import asyncio
+import logging
+import threading
+import time
+import sys
+import os
+
+# Driver asíncrono de cada motor (asyncpg para PostgreSQL, aiosqlite para SQLite)
+ASYNC_DRIVERS = {
+    'postgresql': 'asyncpg',
+    'sqlite': 'aiosqlite',
+}
+
+# Cantidad máxima de escrituras en curso al mismo tiempo
+WRITE_CONCURRENCY = int(os.getenv('DB_WRITE_CONCURRENCY', '4'))
+
+# Etapas cuya inserción puede ser asíncrona: nombre -> (módulo del loader, tabla)
+ASYNC_STAGES = {
+    'team_stats': ('load_team_stats', 'teams_stats'),
+    'nba_champions': ('load_nba_champions', 'nba_champions'),
+    'conference_champions': ('load_conference_champions', 'conference_champions'),
+    'player_stats': ('load_player_stats', 'players_stats'),
+    'mvps': ('load_MVPs', 'mvp'),
+}
+
+# Convertir la URL de la base (DATABASE_URL) a la de su driver asíncrono
+def get_async_url(db_url):
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise RuntimeError(f"No hay un driver asíncrono configurado para '{backend}'")
+    if importlib.util.find_spec(driver) is None:
+        raise RuntimeError(f"La escritura asíncrona necesita el paquete '{driver}' (pip install {driver})")
+    return url.set(drivername=f"{backend}+{driver}")
+
+# Crear un engine asíncrono con la misma configuración de pool que el sincrónico
+def create_async_db_engine():
+    db_url = os.getenv('DATABASE_URL')
+    if not db_url:
+        raise RuntimeError("No se encontró la variable DATABASE_URL")
+    engine = create_async_engine(get_async_url(db_url), **get_pool_options(db_url))
+    enable_sqlite_savepoints(engine.sync_engine)
+    return engine
+
+# Escribir un DataFrame en la tabla sin bloquear el event loop: el mismo camino que 'write_frame'
+# (COPY en PostgreSQL, lotes con savepoints, cuarentena) sobre el driver asíncrono
+async def write_frame_async(engine, table, frame, incremental=False, loader=None):
+    async with AsyncSession(engine) as session:
+        try:
+            rows = await session.run_sync(write_frame, table, frame, incremental, None, loader)
+            await session.commit()
+            return rows
+        except Exception:
+            await session.rollback()
+            raise
+
+# Ejecutar una etapa: la preparación (CPU) en un hilo y la inserción en el event loop,
+# con a lo sumo 'concurrency' inserciones en curso gracias al semáforo
+async def run_stage_async(engine, semaphore, name, incremental=False, memory_report=False):
+    module_name, table_name = ASYNC_STAGES[name]
+    module = importlib.import_module(module_name)
+    start = time.perf_counter()
+    clear_rejects(name)
+    frame = await asyncio.to_thread(module.prepare_payload, memory_report)
+    table = await asyncio.to_thread(get_table, table_name)
+    async with semaphore:
+        with track_stage(name, 'insert', len(frame)) as metrics, profile_stage(name, 'insert'):
+            metrics['rows_out'] = await write_frame_async(engine, table, frame, incremental, name)
+    return time.perf_counter() - start
+
+async def run_stages_async(names, incremental=False, memory_report=False, concurrency=None):
+    engine = create_async_db_engine()
+    semaphore = asyncio.Semaphore(concurrency or WRITE_CONCURRENCY)
+    try:
+        results = await asyncio.gather(
+            *[run_stage_async(engine, semaphore, name, incremental, memory_report) for name in names],
+            return_exceptions=True,
+        )
+    finally:
+        await engine.dispose()
+    return dict(zip(names, results))
+
+# Event loop de las escrituras en un hilo propio, para mezclarlas con las etapas del pipeline de siempre.
+# Devuelve una función que programa una etapa en el loop y devuelve un concurrent.futures.Future, que se
+# puede esperar junto a los del pool de hilos
+@contextmanager
+def async_stage_runner(incremental=False, memory_report=False, concurrency=None):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name='async-writes', daemon=True)
+    thread.start()
+
+    async def setup():
+        return create_async_db_engine(), asyncio.Semaphore(concurrency or WRITE_CONCURRENCY)
+
+    try:
+        engine, semaphore = asyncio.run_coroutine_threadsafe(setup(), loop).result()
+        try:
+            yield lambda name: asyncio.run_coroutine_threadsafe(
+                run_stage_async(engine, semaphore, name, incremental, memory_report), loop
+            )
+        finally:
+            asyncio.run_coroutine_threadsafe(engine.dispose(), loop).result()
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+# Ejecutar las etapas en un solo event loop. Devuelve los tiempos de las que terminaron y
+# los errores de las que fallaron (una falla no cancela las demás)
+def run_async_stages(names, incremental=False, memory_report=False, concurrency=None):
+    results = asyncio.run(run_stages_async(names, incremental, memory_report, concurrency))
+    timings = {}
+    failed = {}
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            failed[name] = str(result)
+            log_event('pipeline_stage_failed', level=logging.ERROR, pipeline_stage=name, error=str(result))
+        else:
+            timings[name] = result
+            log_event('pipeline_stage_finished', pipeline_stage=name, elapsed_s=round(result, 4), mode='async')
+    return timings, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inserción asíncrona de las tablas que dependen de equipos y jugadores")
+    parser.add_argument('stages', nargs='*', help="Etapas a ejecutar (por defecto, todas)")
+    parser.add_argument('--incremental', action='store_true', help="Cargar cada tabla en forma incremental")
+    parser.add_argument('--memory-report', action='store_true', help="Mostrar la memoria de los DataFrames de cada etapa")
+    parser.add_argument('--concurrency', type=int, default=WRITE_CONCURRENCY, help="Inserciones en curso al mismo tiempo")
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                        help="Perfilar cada etapa y guardar los reportes en DIR (ejecuta las etapas de a una)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.stages if name not in ASYNC_STAGES]
+    if unknown:
+        parser.error(f"Etapas sin escritura asíncrona: {', '.join(unknown)}")
+
+    stages = args.stages or list(ASYNC_STAGES)
+    if not args.profile:
+        _, failed = run_async_stages(stages, args.incremental, args.memory_report, args.concurrency)
+        return 1 if failed else 0
+
+    # tracemalloc es global al proceso: con profiling las etapas se ejecutan de a una, sin solaparse
+    enable_profiling(args.profile)
+    failed = {}
+    for name in stages:
+        failed.update(run_async_stages([name], args.incremental, args.memory_report, 1)[1])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,266 @@
+from contextlib import contextmanager, nullcontext
+from sqlalchemy import func, select
+from db_setup import dispose_engine, get_db_connection
+from sources import read_player_stats, read_player_ids, read_team_stats
+from synthetic_data import generate_dataset
+from player_resolution import estimate_birth_years
+from metrics import configure_logging
+from schema import metadata, bulk_load_mode
+from validation import validate_payload
+import load_teams
+import load_players
+import load_team_stats
+import load_nba_champions
+import load_conference_champions
+import load_player_stats
+import load_MVPs
+import sources
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+# Orden de carga (respeta las dependencias del pipeline)
+LOADERS = ['teams', 'players', 'team_stats', 'nba_champions', 'conference_champions', 'player_stats', 'mvps']
+
+# Tablas que se cuentan al final de cada corrida
+TABLES = ['teams', 'players', 'player_ids', 'teams_stats', 'nba_champions', 'conference_champions', 'players_stats', 'mvp']
+
+PLAYER_STATS_CSV = 'data/NBA_Player_Stats.csv'
+PLAYER_IDS_CSV = 'data/NBA_Player_IDs.csv'
+TEAM_STATS_CSV = 'data/NBA_Team_Stats.csv'
+FINALS_EXCEL = 'data/NBA Finals and MVP.xlsx'
+
+# Recrear las tablas vacías del esquema (la base tiene que ser descartable)
+def reset_database():
+    dispose_engine()
+    engine = get_db_connection()
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+# Acumular el tiempo de un paso del loader
+@contextmanager
+def timed(timings, step):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = timings.get(step, 0.0) + time.perf_counter() - start
+
+def bench_teams(timings):
+    with timed(timings, 'insert'):
+        load_teams.main([])
+
+def bench_players(timings):
+    with timed(timings, 'parse'):
+        stats_df = read_player_stats(PLAYER_STATS_CSV, columns=load_players.STATS_SOURCE_COLUMNS)
+        ids_df = read_player_ids(PLAYER_IDS_CSV, columns=load_players.IDS_SOURCE_COLUMNS)
+    with timed(timings, 'normalize'):
+        players_df = load_players.find_players_with_concatenated_positions(stats_df)
+        birth_years = estimate_birth_years(stats_df)
+    with timed(timings, 'merge'):
+        nba_ids = ids_df[['BBRefName', 'BBRefBirthDate', 'NBAName', 'NBAID', 'NBABirthDate']]
+        players_df = load_players.mergeData(players_df, nba_ids, birth_years)
+        players_df = load_players.nullify_conflicting_nba_ids(players_df)
+    with timed(timings, 'prepare'):
+        players_df['NBAID'] = players_df['NBAID'].fillna(-1).astype('int64')
+    with timed(timings, 'insert'):
+        load_players.insert_players(players_df)
+        load_players.insert_player_ids(ids_df)
+
+def bench_team_stats(timings):
+    with timed(timings, 'parse'):
+        team_stats_df = read_team_stats(TEAM_STATS_CSV)
+    with timed(timings, 'normalize'):
+        team_stats_df = load_team_stats.resolve_team_names(team_stats_df)
+    with timed(timings, 'merge'):
+        teams_df = load_team_stats.get_teams_dataframe()
+        merged_df = load_team_stats.merge_team_stats_with_teams(team_stats_df, teams_df)
+        merged_df = load_team_stats.handle_missing_teams(merged_df)
+    with timed(timings, 'prepare'):
+        teams_stats_data = load_team_stats.prepare_teams_stats_data(merged_df)
+    with timed(timings, 'validate'):
+        teams_stats_data = validate_payload('team_stats', 'teams_stats', teams_stats_data)
+    with timed(timings, 'insert'):
+        load_team_stats.insert_teams_stats(teams_stats_data)
+
+def bench_nba_champions(timings):
+    with timed(timings, 'parse'):
+        champions_df = load_nba_champions.load_and_prepare_nba_champions_excel(FINALS_EXCEL)
+    with timed(timings, 'merge'):
+        teams_df = load_nba_champions.get_teams_dataframe()
+        merged_df = load_nba_champions.merge_nba_champions_with_teams(champions_df, teams_df)
+        merged_df = load_nba_champions.handle_missing_teams(merged_df)
+    with timed(timings, 'prepare'):
+        champions_data = load_nba_champions.prepare_nba_champions_data(merged_df)
+    with timed(timings, 'validate'):
+        champions_data = validate_payload('nba_champions', 'nba_champions', champions_data)
+    with timed(timings, 'insert'):
+        load_nba_champions.insert_nba_champions(champions_data)
+
+def bench_conference_champions(timings):
+    with timed(timings, 'parse'):
+        champions_df = load_conference_champions.load_and_prepare_conference_champions_excel(FINALS_EXCEL)
+    with timed(timings, 'merge'):
+        teams_df = load_conference_champions.get_teams_dataframe()
+        merged_df = load_conference_champions.merge_conference_champions_with_teams(champions_df, teams_df)
+        merged_df = load_conference_champions.handle_missing_teams(merged_df)
+    with timed(timings, 'prepare'):
+        champions_data = load_conference_champions.prepare_conference_champions_data(merged_df)
+    with timed(timings, 'validate'):
+        champions_data = validate_payload('conference_champions', 'conference_champions', champions_data)
+    with timed(timings, 'insert'):
+        load_conference_champions.insert_conference_champions(champions_data)
+
+def bench_player_stats(timings):
+    with timed(timings, 'parse'):
+        stats_df = load_player_stats.load_and_prepare_stats_csv(PLAYER_STATS_CSV)
+    with timed(timings, 'merge'):
+        stats_df = load_player_stats.resolve_stats_teams(stats_df, load_player_stats.get_teams_dataframe())
+        players_df = load_player_stats.get_players_dataframe()
+        merged_df = load_player_stats.merge_stats_with_players(stats_df, players_df)
+        merged_df = load_player_stats.handle_missing_players(merged_df)
+    with timed(timings, 'prepare'):
+        players_stats_data = load_player_stats.prepare_players_stats_data(merged_df)
+    with timed(timings, 'validate'):
+        players_stats_data = validate_payload('player_stats', 'players_stats', players_stats_data)
+    with timed(timings, 'insert'):
+        load_player_stats.insert_players_stats(players_stats_data)
+
+def bench_mvps(timings):
+    with timed(timings, 'parse'):
+        mvp_df = load_MVPs.load_and_prepare_mvp_csv(PLAYER_STATS_CSV)
+    with timed(timings, 'merge'):
+        players_df = load_MVPs.get_players_dataframe()
+        merged_df = load_MVPs.merge_mvp_with_players(mvp_df, players_df)
+        merged_df = load_MVPs.handle_missing_players(merged_df)
+    with timed(timings, 'prepare'):
+        mvp_data = load_MVPs.prepare_mvp_data(merged_df)
+    with timed(timings, 'validate'):
+        mvp_data = validate_payload('mvps', 'mvp', mvp_data)
+    with timed(timings, 'insert'):
+        load_MVPs.insert_mvp_data(mvp_data)
+
+BENCHMARKS = {
+    'teams': bench_teams,
+    'players': bench_players,
+    'team_stats': bench_team_stats,
+    'nba_champions': bench_nba_champions,
+    'conference_champions': bench_conference_champions,
+    'player_stats': bench_player_stats,
+    'mvps': bench_mvps,
+}
+
+# Contar las filas de cada tabla (para verificar que la corrida cargó todo)
+def count_rows():
+    engine = get_db_connection()
+    counts = {}
+    with engine.connect() as connection:
+        for name in TABLES:
+            if engine.dialect.has_table(connection, name):
+                counts[name] = connection.execute(select(func.count()).select_from(metadata.tables[name])).scalar()
+    return counts
+
+# Ejecutar todos los loaders una vez sobre la base vacía, devolviendo los tiempos por paso
+# (con 'bulk_load', sin índices secundarios durante la carga; su reconstrucción se mide aparte)
+def run_once(bulk_load=False):
+    reset_database()
+    results = {}
+    with bulk_load_mode() if bulk_load else nullcontext():
+        for name in LOADERS:
+            timings = {}
+            start = time.perf_counter()
+            BENCHMARKS[name](timings)
+            timings['total'] = time.perf_counter() - start
+            results[name] = timings
+        rebuild_start = time.perf_counter()
+    if bulk_load:
+        results['rebuild_indexes'] = {'total': time.perf_counter() - rebuild_start}
+    return results, count_rows()
+
+# Quedarse con el mejor tiempo de cada paso entre varias repeticiones
+def best_timings(runs):
+    return {
+        name: {step: round(min(run[name][step] for run in runs), 6) for step in runs[0][name]}
+        for name in runs[0]
+    }
+
+# Medir un tamaño de datos: generar los archivos, cargar 'repeat' veces y resumir
+def run_scale(scale, workdir, repeat=1, seed=0, bulk_load=False):
+    scale_dir = os.path.join(workdir, f"x{scale}")
+    data_dir = os.path.join(scale_dir, 'data')
+    source_dir = os.path.abspath('data')
+    input_rows = generate_dataset(source_dir, data_dir, scale, seed)
+
+    # Los loaders usan rutas relativas ('data/...'): se ejecutan desde el directorio del tamaño
+    cwd = os.getcwd()
+    os.chdir(scale_dir)
+    try:
+        runs = []
+        for _ in range(repeat):
+            timings, table_rows = run_once(bulk_load)
+            runs.append(timings)
+    finally:
+        os.chdir(cwd)
+
+    return {'input_rows': input_rows, 'table_rows': table_rows, 'loaders': best_timings(runs)}
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de cada etapa de los loaders con datos sintéticos escalados")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help="Factores de escala a medir")
+    parser.add_argument('--repeat', type=int, default=1, help="Repeticiones por escala (se informa el mejor tiempo)")
+    parser.add_argument('--database-url', help="Base descartable (sus tablas se recrean). Por defecto, SQLite en el directorio de trabajo")
+    parser.add_argument('--workdir', help="Directorio para los datos generados (por defecto, uno temporal)")
+    parser.add_argument('--output', help="Archivo JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument('--parse-cache', action='store_true', help="Usar la caché de archivos parseados")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bulk-load', action='store_true', help="Cargar sin índices secundarios y medir su reconstrucción")
+    parser.add_argument('--verbose', action='store_true', help="Mostrar los logs de los loaders")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='nba-bench-'))
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['DATABASE_URL'] = database_url
+    sources.CACHE_ENABLED = args.parse_cache
+    # Los logs de cada etapa solo con --verbose (los errores siempre)
+    configure_logging('INFO' if args.verbose else 'ERROR')
+
+    results = {
+        'revision': get_git_revision(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'database': get_db_connection().dialect.name,
+        'parse_cache': args.parse_cache,
+        'bulk_load': args.bulk_load,
+        'repeat': args.repeat,
+        'scales': {},
+    }
+    for scale in args.scales:
+        print(f"Midiendo escala x{scale}...", file=sys.stderr)
+        results['scales'][str(scale)] = run_scale(scale, workdir, args.repeat, args.seed, args.bulk_load)
+    dispose_engine()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,158 @@
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, OperationalError
+from sqlalchemy.util import await_only
+from utils import frame_to_records
+from metrics import log_event, write_rejects
+import pandas as pd
+import logging
+import time
+import io
+import os
+
+# Tamaño de los lotes: cada uno se escribe en su propio savepoint (y en lotes de executemany
+# cuando no se puede usar COPY)
+BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', '5000'))
+
+# Reintentos de un lote ante errores transitorios (bloqueos, deadlocks) y espera inicial entre ellos
+RETRIES = int(os.getenv('DB_RETRIES', '3'))
+RETRY_BACKOFF = float(os.getenv('DB_RETRY_BACKOFF', '0.5'))
+
+# Límites de la cuarentena: si la base rechaza más filas que esta proporción del DataFrame (o que esta
+# cantidad), el error es sistemático (tabla ya cargada, esquema distinto) y la carga falla en vez de seguir
+QUARANTINE_MAX_RATIO = float(os.getenv('DB_QUARANTINE_MAX_RATIO', '0.1'))
+QUARANTINE_MAX_ROWS = int(os.getenv('DB_QUARANTINE_MAX_ROWS', '1000'))
+
+# SQLSTATE de PostgreSQL: transitorios (40 deadlock/serialización, 53 recursos, 55P03 lock no disponible)
+# y errores de datos (22 datos inválidos, 23 restricciones)
+TRANSIENT_SQLSTATES = ('40', '53', '55P03')
+DATA_SQLSTATES = ('22', '23')
+
+# Errores transitorios de SQLite (no tiene SQLSTATE): se reconocen por el mensaje del driver
+TRANSIENT_SQLITE_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+# Escribir el DataFrame en un buffer CSV en memoria (las celdas vacías se cargan como NULL)
+def frame_to_csv_buffer(frame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+    return buffer
+
+# Cargar el DataFrame en PostgreSQL con COPY ... FROM STDIN
+def copy_frame(connection, table, frame):
+    preparer = connection.dialect.identifier_preparer
+    columns = ', '.join(preparer.quote(column) for column in frame.columns)
+    sql = f"COPY {preparer.format_table(table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    buffer = frame_to_csv_buffer(frame)
+
+    dbapi_connection = connection.connection.driver_connection
+    if hasattr(dbapi_connection, 'copy_to_table'):
+        # asyncpg (escritura asíncrona): la corrutina se espera desde el contexto de run_sync
+        await_only(dbapi_connection.copy_to_table(
+            table.name, schema_name=table.schema, source=io.BytesIO(buffer.getvalue().encode()),
+            columns=list(frame.columns), format='csv',
+        ))
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+# Insertar el DataFrame con executemany en lotes (SQLite y otros motores)
+def executemany_frame(connection, table, frame, batch_size=None):
+    batch_size = batch_size or BATCH_SIZE
+    records = frame_to_records(frame)
+    for start in range(0, len(records), batch_size):
+        connection.execute(table.insert(), records[start:start + batch_size])
+
+# Código SQLSTATE del error, también cuando viene directo del driver (COPY no pasa por SQLAlchemy)
+def get_sqlstate(error):
+    orig = getattr(error, 'orig', error)
+    return getattr(orig, 'sqlstate', None) or getattr(orig, 'pgcode', None)
+
+# Un error transitorio se reintenta; si la conexión se perdió, la transacción ya no se puede recuperar.
+# Cualquier otro error operativo (por ejemplo una tabla o columna inexistente) se propaga de inmediato
+def is_transient_error(error):
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return False
+    sqlstate = get_sqlstate(error)
+    if sqlstate:
+        return sqlstate.startswith(TRANSIENT_SQLSTATES)
+    if not isinstance(error, OperationalError):
+        return False
+    message = str(getattr(error, 'orig', error)).lower()
+    return any(transient in message for transient in TRANSIENT_SQLITE_MESSAGES)
+
+# Un error de datos depende de las filas del lote: se aísla y se pone en cuarentena
+def is_data_error(error):
+    sqlstate = get_sqlstate(error)
+    if sqlstate:
+        return sqlstate.startswith(DATA_SQLSTATES)
+    return isinstance(error, (IntegrityError, DataError))
+
+# Escribir un lote dentro de un savepoint. Los errores transitorios se reintentan con espera
+# exponencial; ante un error de datos el lote se parte en mitades hasta aislar las filas que
+# fallan, que se agregan a 'quarantined' con el error de la base. Si las filas en cuarentena superan
+# 'limit' se corta la carga con RuntimeError. Devuelve las filas escritas
+def write_batch_isolated(session, batch, write_batch, quarantined, retries, limit=None):
+    attempt = 0
+    while True:
+        try:
+            with session.begin_nested():
+                write_batch(batch)
+            return len(batch)
+        except Exception as e:
+            message = str(getattr(e, 'orig', e)).strip()
+            if is_transient_error(e) and attempt < retries:
+                attempt += 1
+                log_event('batch_retry', level=logging.WARNING, rows=len(batch), attempt=attempt, error=message)
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+                continue
+            if not is_data_error(e):
+                raise
+            if len(batch) == 1:
+                quarantined.append(batch.assign(error=message))
+                if limit is not None and len(quarantined) > limit:
+                    raise RuntimeError(f"La base rechazó más de {limit} filas, el error parece sistemático: {message}") from e
+                return 0
+            middle = len(batch) // 2
+            return (write_batch_isolated(session, batch.iloc[:middle], write_batch, quarantined, retries, limit)
+                    + write_batch_isolated(session, batch.iloc[middle:], write_batch, quarantined, retries, limit))
+
+# Escribir el DataFrame por lotes, cada uno en su savepoint: las filas que la base rechaza van al
+# archivo de rechazos del loader (motivo 'db_error') y el resto se confirma igual con la transacción.
+# Si la base rechaza el primer lote entero o más filas que los límites de la cuarentena, la carga falla
+def write_in_batches(session, table, frame, write_batch, loader=None, batch_size=None, retries=None):
+    batch_size = batch_size or BATCH_SIZE
+    retries = RETRIES if retries is None else retries
+    limit = max(min(QUARANTINE_MAX_ROWS, int(len(frame) * QUARANTINE_MAX_RATIO)), 1)
+    quarantined = []
+    written = 0
+    for start in range(0, len(frame), batch_size):
+        written += write_batch_isolated(session, frame.iloc[start:start + batch_size], write_batch, quarantined, retries, limit)
+        if start == 0 and written == 0:
+            raise RuntimeError(f"La base rechazó el primer lote entero de '{table.name}': {quarantined[0]['error'].iloc[0]}")
+    if quarantined:
+        write_rejects(loader or table.name, pd.concat(quarantined), 'db_error')
+    return written
+
+# Insertar un DataFrame ya preparado en la tabla, usando COPY si el motor es PostgreSQL.
+# Devuelve la cantidad de filas insertadas (sin las que quedaron en cuarentena)
+def bulk_insert(session, table, frame, batch_size=None, loader=None):
+    if frame.empty:
+        return 0
+
+    def insert_batch(batch):
+        connection = session.connection()
+        if connection.dialect.name == 'postgresql':
+            copy_frame(connection, table, batch)
+        else:
+            executemany_frame(connection, table, batch, batch_size)
+
+    return write_in_batches(session, table, frame, insert_batch, loader, batch_size)
@@ -0,0 +1,85 @@
+from sqlalchemy import delete
+from db_setup import get_db_connection
+from schema import player_ids_table
+from bulk_load import bulk_insert
+from utils import build_frame, normalize_names
+import threading
+import pandas as pd
+
+# Columnas del CSV de IDs que aportan variantes del nombre del jugador
+NAME_COLUMNS = ['name', 'BBRefName', 'NBAName', 'ESPNName', 'SpotracName']
+
+# Mapeo de columnas de 'player_ids': columna en la tabla -> (columna del DataFrame, tipo)
+PLAYER_IDS_COLUMNS = {
+    'id_player': ('id_player', 'int64'),
+    'name_norm': ('name_norm', None),
+    'bbref_id': ('BBRefID', None),
+    'nba_id': ('nba_id', 'Int64'),
+    'espn_id': ('ESPNID', 'Int64'),
+    'spotrac_id': ('SpotracID', 'Int64'),
+}
+
+# Fuentes por las que se puede resolver un jugador -> columna de la tabla
+SOURCE_COLUMNS = {
+    'bbref': 'bbref_id',
+    'nba': 'nba_id',
+    'espn': 'espn_id',
+    'spotrac': 'spotrac_id',
+    'name': 'name_norm',
+}
+
+# Crosswalk en memoria (se carga una vez por proceso)
+_crosswalk = None
+_lock = threading.Lock()
+
+# Crear la tabla 'player_ids' y sus índices si no existen
+def create_player_ids_table(engine=None):
+    player_ids_table.create(engine or get_db_connection(), checkfirst=True)
+
+# Construir el crosswalk: una fila por jugador y variante de nombre, con los ids de cada fuente
+def build_player_crosswalk(players_db_df, ids_df):
+    players = players_db_df[['id', 'name', 'nba_id']].rename(columns={'id': 'id_player'})
+    players['nba_id'] = players['nba_id'].astype('Int64').where(players['nba_id'] >= 0)
+
+    ids = ids_df[ids_df['NBAID'].notna()].drop_duplicates('NBAID')
+    ids = ids.assign(nba_id=ids['NBAID'].astype('Int64'))
+    merged = players.merge(ids, on='nba_id', how='left')
+
+    # Una fila por variante de nombre normalizada
+    id_columns = ['id_player', 'BBRefID', 'nba_id', 'ESPNID', 'SpotracID']
+    variants = merged.melt(id_vars=id_columns, value_vars=NAME_COLUMNS, value_name='raw_name')
+    # Mismas reglas que usan los loaders para unir por nombre (se conserva el asterisco de Hall of Fame)
+    variants['name_norm'] = normalize_names(variants['raw_name'])
+    variants = variants[variants['name_norm'] != ''].drop_duplicates(['id_player', 'name_norm'])
+    return build_frame(variants.sort_values('id_player'), PLAYER_IDS_COLUMNS)
+
+# Reemplazar el contenido de 'player_ids' con el crosswalk nuevo
+def insert_player_crosswalk(session, crosswalk_df):
+    global _crosswalk
+    create_player_ids_table(session.get_bind())
+    session.execute(delete(player_ids_table))
+    bulk_insert(session, player_ids_table, crosswalk_df, loader='players')
+    with _lock:
+        _crosswalk = None
+
+# Obtener el crosswalk completo desde la base (en caché por proceso)
+def get_player_crosswalk():
+    global _crosswalk
+    with _lock:
+        if _crosswalk is None:
+            _crosswalk = pd.read_sql_table('player_ids', con=get_db_connection())
+        return _crosswalk
+
+# Resolver en bloque el id interno de jugador a partir de ids de otra fuente o de nombres
+def resolve_player_ids(values, source, crosswalk=None):
+    column = SOURCE_COLUMNS[source]
+    crosswalk = get_player_crosswalk() if crosswalk is None else crosswalk
+    # Un valor que apunta a más de un jugador es ambiguo y no se resuelve
+    lookup = crosswalk.dropna(subset=[column]).drop_duplicates([column, 'id_player'])
+    lookup = lookup.drop_duplicates(column, keep=False)
+    lookup = lookup.set_index(column)['id_player']
+    if source == 'name':
+        values = normalize_names(values)
+    elif column != 'bbref_id':
+        values = pd.to_numeric(values, errors='coerce').astype('Int64')
+    return values.map(lookup).astype('Int64')
@@ -1,23 +1,100 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, MetaData, Table
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+import threading
 import os
 
 # Cargar variables de entorno desde el archivo .env
 load_dotenv()
 
-# Crear conexión a la base de datos
+# Configuración del pool de conexiones (se puede sobrescribir desde el .env)
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+SQLITE_TIMEOUT = float(os.getenv('DB_SQLITE_TIMEOUT', '60'))
+
+# Engine y fábrica de sesiones compartidos por todo el proceso (se crean al primer uso)
+_engine = None
+_Session = None
+_lock = threading.RLock()
+
+# Tablas reflejadas una sola vez por engine (nombre -> Table)
+_metadata = None
+_tables = {}
+
+# Construir los argumentos del pool según el dialecto
+def get_pool_options(db_url):
+    options = {
+        'pool_pre_ping': POOL_PRE_PING,
+        'pool_recycle': POOL_RECYCLE,
+    }
+    # SQLite no usa QueuePool en memoria, así que solo se configura el tamaño para otros motores
+    if make_url(db_url).get_backend_name() != 'sqlite':
+        options['pool_size'] = POOL_SIZE
+        options['max_overflow'] = MAX_OVERFLOW
+    else:
+        # Las transacciones de SQLite se serializan: cada conexión espera el lock hasta este tiempo
+        options['connect_args'] = {'timeout': SQLITE_TIMEOUT}
+    return options
+
+# El driver sqlite3 abre las transacciones por su cuenta y no respeta los SAVEPOINT: se le quita
+# ese manejo y SQLAlchemy emite el BEGIN (así la carga por lotes con savepoints funciona igual que en PostgreSQL).
+# BEGIN IMMEDIATE toma el lock de escritura al empezar: una transacción que lee y después escribe
+# (carga incremental) espera su turno en lugar de fallar con 'database is locked' al pedir el lock
+def enable_sqlite_savepoints(engine):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def emit_begin(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+# Obtener el engine compartido (se crea una sola vez por proceso)
+def get_engine():
+    global _engine, _Session
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                db_url = os.getenv('DATABASE_URL')
+                if not db_url:
+                    raise RuntimeError("No se encontró la variable DATABASE_URL")
+                _engine = create_engine(db_url, **get_pool_options(db_url))
+                enable_sqlite_savepoints(_engine)
+                _Session = sessionmaker(bind=_engine)
+    return _engine
+
+# Crear conexión a la base de datos (se mantiene el nombre usado por los loaders)
 def get_db_connection():
-    db_url = os.getenv('DATABASE_URL')
-    engine = create_engine(db_url)
-    print(f"Conexión a la base de datos exitosa: {db_url}")
-    return engine
+    return get_engine()
 
 # Crear sesión de base de datos
 def get_db_session():
-    engine = get_db_connection()
-    Session = sessionmaker(bind=engine)
-    print("Sesión de base de datos creada.", Session)
-    return Session()
+    get_engine()
+    return _Session()
+
+# Obtener la definición de una tabla, reflejándola desde la base solo la primera vez
+def get_table(name):
+    global _metadata
+    with _lock:
+        if name not in _tables:
+            if _metadata is None:
+                _metadata = MetaData()
+            _tables[name] = Table(name, _metadata, autoload_with=get_engine())
+        return _tables[name]
 
-get_db_session()
\ No newline at end of file
+# Cerrar el pool (por ejemplo, antes de hacer fork en procesos hijos)
+def dispose_engine():
+    global _engine, _Session, _metadata
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _Session = None
+        _metadata = None
+        _tables.clear()
@@ -0,0 +1,175 @@
+from sqlalchemy import select
+from db_setup import get_db_connection, get_table, dispose_engine
+from incremental import HASH_COLUMN
+from sources import PARQUET_AVAILABLE
+from metrics import log_event, tracked
+import threading
+import argparse
+import hashlib
+import shutil
+import json
+import sys
+import os
+import pandas as pd
+
+# Directorio de la exportación (una carpeta por tabla) y compresión de los archivos Parquet
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'data/export')
+EXPORT_COMPRESSION = os.getenv('EXPORT_COMPRESSION', 'zstd')
+
+# Archivo con el hash de cada partición exportada (para la exportación incremental)
+MANIFEST_FILE = '_manifest.json'
+
+# Partición que agrupa las filas sin temporada (convención de Hive)
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Tablas exportables: nombre -> columna de temporada por la que se particiona (None = un solo archivo).
+# Campeones y MVPs tienen una o dos filas por temporada: particionarlos sería un archivo por fila
+EXPORT_TABLES = {
+    'teams': None,
+    'players': None,
+    'player_ids': None,
+    'teams_stats': 'year',
+    'nba_champions': None,
+    'conference_champions': None,
+    'players_stats': 'season',
+    'mvp': None,
+}
+
+# Columnas que no se exportan por defecto: el hash interno de la carga incremental y,
+# en 'players_stats', 'year', que repite la temporada de la partición
+EXCLUDED_COLUMNS = {
+    'players_stats': [HASH_COLUMN, 'year'],
+}
+
+# Columnas a exportar de la tabla: las indicadas o todas salvo las excluidas
+def get_export_columns(table, columns=None):
+    if columns:
+        unknown = [column for column in columns if column not in table.c]
+        if unknown:
+            raise ValueError(f"Columnas inexistentes en '{table.name}': {', '.join(unknown)}")
+        return list(columns)
+    excluded = EXCLUDED_COLUMNS.get(table.name, [HASH_COLUMN])
+    return [column.name for column in table.columns if column.name not in excluded]
+
+# Leer la tabla con las columnas proyectadas (y la de partición), en el orden de la clave primaria
+# para que el contenido de cada partición, y por lo tanto su hash, no dependa del plan de la consulta
+def read_table(table, columns, partition_column=None):
+    selected = columns + [partition_column] if partition_column and partition_column not in columns else columns
+    query = select(*[table.c[column] for column in selected]).order_by(*table.primary_key.columns)
+    return pd.read_sql(query, get_db_connection())
+
+# Hash del contenido de una partición (valores, columnas y tipos)
+def hash_partition(frame):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[column, str(dtype)] for column, dtype in frame.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def read_export_manifest(table_dir):
+    try:
+        with open(os.path.join(table_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_export_manifest(table_dir, manifest):
+    path = os.path.join(table_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+# Escribir una partición a un archivo temporal y reemplazar la anterior de una vez
+def write_partition(frame, path, compression):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    frame.to_parquet(tmp_path, index=False, compression=compression)
+    os.replace(tmp_path, path)
+
+# Separar las filas por temporada: nombre de la carpeta de la partición -> filas (sin la columna de partición,
+# que queda en el nombre de la carpeta como en el particionado de Hive)
+def split_partitions(frame, partition_column):
+    if partition_column is None:
+        return {'': frame}
+    partitions = {}
+    for value, rows in frame.groupby(partition_column, dropna=False, sort=True):
+        name = NULL_PARTITION if pd.isna(value) else str(int(value))
+        partitions[f"{partition_column}={name}"] = rows.drop(columns=partition_column)
+    return partitions
+
+# Exportar una tabla a Parquet particionado por temporada. En modo incremental solo se escriben las
+# particiones cuyo contenido cambió desde la última exportación. Devuelve la cantidad de filas exportadas
+def export_table(table_name, export_dir=EXPORT_DIR, columns=None, compression=EXPORT_COMPRESSION, incremental=False):
+    table = get_table(table_name)
+    partition_column = EXPORT_TABLES[table_name]
+    columns = get_export_columns(table, columns)
+    frame = read_table(table, columns, partition_column)
+    partitions = split_partitions(frame, partition_column)
+
+    table_dir = os.path.join(export_dir, table_name)
+    previous = read_export_manifest(table_dir) if incremental else {}
+    if previous.get('compression') != compression:
+        previous = {}
+    previous_partitions = previous.get('partitions', {})
+
+    manifest = {'table': table_name, 'partition_column': partition_column, 'compression': compression, 'partitions': {}}
+    written = 0
+    for name, rows in partitions.items():
+        partition_hash = hash_partition(rows)
+        path = os.path.join(table_dir, name, 'part-0.parquet')
+        if previous_partitions.get(name, {}).get('hash') != partition_hash or not os.path.exists(path):
+            write_partition(rows, path, compression)
+            written += 1
+        manifest['partitions'][name] = {'hash': partition_hash, 'rows': len(rows)}
+
+    # Borrar las particiones que ya no existen (o las de una exportación anterior sin manifiesto)
+    removed = 0
+    if os.path.isdir(table_dir):
+        for entry in os.listdir(table_dir):
+            entry_path = os.path.join(table_dir, entry)
+            if entry != MANIFEST_FILE and entry not in partitions and os.path.isdir(entry_path):
+                shutil.rmtree(entry_path)
+                removed += 1
+        if '' not in partitions and os.path.exists(os.path.join(table_dir, 'part-0.parquet')):
+            os.remove(os.path.join(table_dir, 'part-0.parquet'))
+    write_export_manifest(table_dir, manifest)
+
+    log_event('export', table=table_name, rows=len(frame), columns=columns, partitions=len(partitions),
+              written=written, skipped=len(partitions) - written, removed=removed, compression=compression)
+    return len(frame)
+
+# Exportar varias tablas (por defecto, todas las que existen en la base)
+def export_tables(names=None, export_dir=EXPORT_DIR, columns=None, compression=EXPORT_COMPRESSION, incremental=False):
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("La exportación a Parquet necesita el paquete 'pyarrow' (pip install pyarrow)")
+    engine = get_db_connection()
+    if names is None:
+        with engine.connect() as connection:
+            names = [name for name in EXPORT_TABLES if engine.dialect.has_table(connection, name)]
+    return {
+        name: tracked('export', name, export_table, name, export_dir, columns, compression, incremental)
+        for name in names
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportar las tablas cargadas a Parquet particionado por temporada")
+    parser.add_argument('tables', nargs='*', help="Tablas a exportar (por defecto, todas)")
+    parser.add_argument('--output', default=EXPORT_DIR, help="Directorio de la exportación")
+    parser.add_argument('--columns', nargs='+', metavar='COLUMN', help="Columnas a exportar (solo con una tabla)")
+    parser.add_argument('--compression', default=EXPORT_COMPRESSION, help="Compresión de Parquet (zstd, snappy, gzip, none)")
+    parser.add_argument('--incremental', action='store_true', help="Escribir solo las particiones que cambiaron")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.tables if name not in EXPORT_TABLES]
+    if unknown:
+        parser.error(f"Tablas desconocidas: {', '.join(unknown)}")
+    if args.columns and len(args.tables) != 1:
+        parser.error("--columns se puede usar solo al exportar una tabla")
+
+    compression = None if args.compression == 'none' else args.compression
+    export_tables(args.tables or None, args.output, args.columns, compression, args.incremental)
+    dispose_engine()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,125 @@
+from utils import normalize_names
+import numpy as np
+import pandas as pd
+
+# Nombres, ciudades y abreviaturas de cada franquicia, con la temporada (año de finalización)
+# desde/hasta la que son válidos. None significa sin límite. Los nombres se normalizan al compilar.
+FRANCHISES = {
+    'Atlanta Hawks': [
+        ('Atlanta', 1969, None), ('St. Louis', 1956, 1968), ('Milwaukee', 1952, 1955), ('Tri-Cities', 1950, 1951),
+        ('St. Louis Hawks', None, None), ('Milwaukee Hawks', None, None), ('Tri-Cities Blackhawks', None, None),
+        ('ATL', None, None), ('STL', None, None),
+    ],
+    'Boston Celtics': [('Boston', None, None), ('BOS', None, None)],
+    'Brooklyn Nets': [
+        ('Brooklyn', 2013, None), ('New Jersey', 1978, 2012), ('New Jersey Nets', None, None),
+        ('BRK', None, None), ('BKN', None, None), ('NJN', None, None),
+    ],
+    'Charlotte Hornets': [
+        ('Charlotte', 1989, 2002), ('Charlotte', 2005, None), ('Charlotte Bobcats', None, None),
+        ('CHH', None, None), ('CHA', None, None), ('CHO', None, None),
+    ],
+    'Chicago Bulls': [('Chicago', 1967, None), ('CHI', None, None)],
+    'Cleveland Cavaliers': [('Cleveland', None, None), ('CLE', None, None)],
+    'Dallas Mavericks': [('Dallas', None, None), ('DAL', None, None)],
+    'Denver Nuggets': [('Denver', None, None), ('DEN', None, None)],
+    'Detroit Pistons': [
+        ('Detroit', 1958, None), ('Fort Wayne', None, 1957), ('Fort Wayne Pistons', None, None), ('DET', None, None),
+    ],
+    'Golden State Warriors': [
+        ('Golden State', 1972, None), ('San Francisco', 1963, 1971), ('Philadelphia', None, 1962),
+        ('Philadelphia Warriors', None, None), ('San Francisco Warriors', None, None), ('GSW', None, None),
+    ],
+    'Houston Rockets': [
+        ('Houston', 1972, None), ('San Diego', 1968, 1971), ('San Diego Rockets', None, None), ('HOU', None, None),
+    ],
+    'Indiana Pacers': [('Indiana', None, None), ('IND', None, None)],
+    'LA Clippers': [
+        ('L.A. Clippers', None, None), ('L.A.Clippers', None, None), ('Los Angeles Clippers', None, None),
+        ('San Diego', 1979, 1984), ('Buffalo', 1971, 1978), ('San Diego Clippers', None, None),
+        ('Buffalo Braves', None, None), ('LAC', None, None),
+    ],
+    'Los Angeles Lakers': [
+        ('L.A. Lakers', None, None), ('L.A.Lakers', None, None), ('Lakers', None, None),
+        ('Minneapolis', None, 1960), ('Minneapolis Lakers', None, None), ('LAL', None, None),
+    ],
+    'Memphis Grizzlies': [
+        ('Memphis', 2002, None), ('Vancouver', 1996, 2001), ('Vancouver Grizzlies', None, None),
+        ('MEM', None, None), ('VAN', None, None),
+    ],
+    'Miami Heat': [('Miami', None, None), ('MIA', None, None)],
+    'Milwaukee Bucks': [('Milwaukee', 1969, None), ('MIL', None, None)],
+    'Minnesota Timberwolves': [('Minnesota', None, None), ('MIN', None, None)],
+    'New Orleans Pelicans': [
+        ('New Orleans', 2003, None), ('New Orleans Hornets', None, None),
+        ('New Orleans/Oklahoma City Hornets', None, None), ('NOH', None, None), ('NOK', None, None), ('NOP', None, None),
+    ],
+    'New York Knicks': [('New York', None, None), ('NYK', None, None)],
+    'Oklahoma City Thunder': [
+        ('Oklahoma City', 2009, None), ('Seattle', 1968, 2008), ('Seattle SuperSonics', None, None),
+        ('OKC', None, None), ('SEA', None, None),
+    ],
+    'Orlando Magic': [('Orlando', None, None), ('ORL', None, None)],
+    'Philadelphia 76ers': [
+        ('Philadelphia', 1964, None), ('Syracuse', None, 1963), ('Syracuse Nationals', None, None), ('PHI', None, None),
+    ],
+    'Phoenix Suns': [('Phoenix', None, None), ('PHO', None, None), ('PHX', None, None)],
+    'Portland Trail Blazers': [('Portland', None, None), ('POR', None, None)],
+    'Sacramento Kings': [
+        ('Sacramento', 1986, None), ('Kansas City', 1976, 1985), ('Kansas City-Omaha', 1973, 1975),
+        ('Cincinnati', 1958, 1972), ('Rochester', None, 1957), ('Kansas City Kings', None, None),
+        ('Cincinnati Royals', None, None), ('Rochester Royals', None, None), ('SAC', None, None), ('KCK', None, None),
+    ],
+    'San Antonio Spurs': [('San Antonio', None, None), ('SAS', None, None)],
+    'Toronto Raptors': [('Toronto', None, None), ('TOR', None, None)],
+    'Utah Jazz': [
+        ('Utah', 1980, None), ('New Orleans', 1975, 1979), ('New Orleans Jazz', None, None), ('UTA', None, None),
+    ],
+    'Washington Wizards': [
+        ('Washington', 1974, None), ('Baltimore', 1964, 1973), ('Chicago', 1962, 1963), ('Baltimore Bullets', None, None),
+        ('Washington Bullets', None, None), ('Capital Bullets', None, None), ('Chicago Zephyrs', None, None),
+        ('Chicago Packers', None, None), ('WAS', None, None), ('WSB', None, None),
+    ],
+}
+
+# Compilar la tabla de alias: nombre normalizado, rango de temporadas y franquicia
+def compile_aliases(franchises):
+    rows = []
+    for franchise, aliases in franchises.items():
+        # El nombre actual de la franquicia siempre es un alias válido
+        rows.append((franchise, None, None, franchise))
+        rows.extend((alias, first, last, franchise) for alias, first, last in aliases)
+    aliases = pd.DataFrame(rows, columns=['alias', 'first_season', 'last_season', 'franchise'])
+    aliases['alias'] = normalize_names(aliases['alias'])
+    aliases['first_season'] = aliases['first_season'].fillna(-np.inf).astype(float)
+    aliases['last_season'] = aliases['last_season'].fillna(np.inf).astype(float)
+    return aliases.drop_duplicates()
+
+ALIASES = compile_aliases(FRANCHISES)
+
+# Resolver la franquicia de una columna de nombres o abreviaturas según la temporada
+# (clave entera de 'seasons.season_keys'). Devuelve el nombre actual de la franquicia o NA si no se reconoce.
+def resolve_franchises(names, seasons=None):
+    if seasons is None:
+        seasons = pd.Series(np.nan, index=names.index)
+    keys = pd.DataFrame({'alias': normalize_names(names), 'season': np.asarray(seasons, dtype=float)})
+
+    # Resolver una sola vez cada par (nombre, temporada)
+    unique_keys = keys.drop_duplicates()
+    candidates = unique_keys.merge(ALIASES, on='alias', how='inner')
+    in_range = (candidates['season'] >= candidates['first_season']) & (candidates['season'] <= candidates['last_season'])
+    # Sin temporada solo valen los alias que no dependen de la época
+    era_free = np.isinf(candidates['first_season']) & np.isinf(candidates['last_season'])
+    in_range |= candidates['season'].isna() & era_free
+    candidates = candidates[in_range].drop_duplicates(['alias', 'season', 'franchise'])
+    # Un alias que en esa temporada corresponde a más de una franquicia es ambiguo
+    candidates = candidates.drop_duplicates(['alias', 'season'], keep=False)
+
+    resolved = keys.merge(candidates[['alias', 'season', 'franchise']], on=['alias', 'season'], how='left')
+    return pd.Series(resolved['franchise'].to_numpy(dtype=object), index=names.index, name='franchise')
+
+# Resolver el id de equipo (tabla 'teams') de una columna de nombres o abreviaturas según la temporada
+def resolve_team_ids(names, seasons, teams_df):
+    team_ids = pd.Series(teams_df['id'].to_numpy(), index=normalize_names(teams_df['name']))
+    franchises = normalize_names(resolve_franchises(names, seasons))
+    return franchises.map(team_ids).astype('Int64')
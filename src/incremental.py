@@ -0,0 +1,119 @@
+from sqlalchemy import BigInteger, Column, and_, bindparam, inspect, select
+from bulk_load import bulk_insert, write_in_batches
+from utils import frame_to_records
+from metrics import log_event
+import pandas as pd
+
+# Claves naturales de cada tabla para las cargas incrementales
+NATURAL_KEYS = {
+    'teams': ['id'],
+    'players': ['name'],
+    'players_stats': ['id_player', 'season', 'team'],
+    'teams_stats': ['idteam', 'year'],
+    'mvp': ['year'],
+    'nba_champions': ['year'],
+    'conference_champions': ['year', 'conference'],
+}
+
+# Columna donde se guarda el hash del contenido de cada fila
+HASH_COLUMN = 'row_hash'
+
+# Calcular un hash de 64 bits por fila a partir de todas las columnas del payload
+def compute_row_hashes(frame):
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view('int64')
+
+# Agregar una columna a la tabla si todavía no existe (en su propia transacción, para que un rollback
+# de la carga no deje la definición en caché desincronizada). Migra bases creadas antes de que 'schema.py'
+# la declarara
+def ensure_column(engine, table, name, column_type):
+    # La definición de la tabla está en caché: si ya tiene la columna no hace falta consultar el catálogo
+    if name in table.c:
+        return
+    with engine.begin() as connection:
+        columns = [column['name'] for column in inspect(connection).get_columns(table.name, schema=table.schema)]
+        if name not in columns:
+            preparer = connection.dialect.identifier_preparer
+            connection.exec_driver_sql(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.quote(name)} "
+                f"{column_type.compile(dialect=connection.dialect)}"
+            )
+    table.append_column(Column(name, column_type))
+
+def ensure_hash_column(engine, table):
+    ensure_column(engine, table, HASH_COLUMN, BigInteger())
+
+# Leer de la base las claves naturales y el hash de las filas ya cargadas
+# ('scope' limita la lectura a las filas con esos valores, por ejemplo una temporada o una lista de temporadas)
+def get_existing_hashes(connection, table, keys, scope=None):
+    query = select(*[table.c[key] for key in keys], table.c[HASH_COLUMN])
+    for column, value in (scope or {}).items():
+        if isinstance(value, (list, tuple)):
+            query = query.where(table.c[column].in_(value))
+        else:
+            query = query.where(table.c[column] == value)
+    return pd.DataFrame(connection.execute(query).fetchall(), columns=keys + [HASH_COLUMN])
+
+# Llevar las claves leídas de la base al tipo del DataFrame. Una clave numérica con valores que no lo
+# son (temporadas todavía en texto, como '1997-98') indica una base sin migrar
+def align_key_types(existing, frame, table, keys):
+    for key in keys:
+        if not pd.api.types.is_numeric_dtype(frame[key]):
+            continue
+        invalid = existing[key].notna() & pd.to_numeric(existing[key], errors='coerce').isna()
+        if invalid.any():
+            raise RuntimeError(
+                f"'{table.name}.{key}' tiene valores no numéricos en la base (por ejemplo {existing.loc[invalid, key].iloc[0]!r}): "
+                "migrar las temporadas con 'python src/seasons.py --migrate' antes de la carga incremental"
+            )
+    return existing.astype({key: frame[key].dtype for key in keys})
+
+# Actualizar las filas cuyo contenido cambió, identificándolas por la clave natural
+def update_frame(connection, table, frame, keys):
+    condition = and_(*[table.c[key] == bindparam(f'key_{key}') for key in keys])
+    values = {column: bindparam(column) for column in frame.columns if column not in keys}
+    records = frame_to_records(frame.rename(columns={key: f'key_{key}' for key in keys}))
+    connection.execute(table.update().where(condition).values(values), records)
+
+# Cargar el DataFrame en forma incremental: insertar filas nuevas, actualizar las modificadas
+# y omitir las que no cambiaron. Devuelve la cantidad de filas insertadas, actualizadas y omitidas.
+# Con 'scope' solo se comparan las filas de la base con esos valores (el frame debe cumplirlo).
+# Las filas que la base rechaza quedan en cuarentena y no se cuentan
+def upsert_frame(session, table, frame, keys=None, scope=None, loader=None):
+    keys = keys or NATURAL_KEYS[table.name]
+    ensure_hash_column(session.get_bind(), table)
+    connection = session.connection()
+
+    frame = frame.drop_duplicates(subset=keys, keep='last').copy()
+    frame[HASH_COLUMN] = compute_row_hashes(frame)
+
+    existing = get_existing_hashes(connection, table, keys, scope)
+    existing = existing.drop_duplicates(subset=keys, keep='last')
+    existing = align_key_types(existing, frame, table, keys)
+    existing[HASH_COLUMN] = existing[HASH_COLUMN].astype('Int64')
+    merged = frame.merge(existing, on=keys, how='left', suffixes=('', '_db'), indicator=True)
+
+    is_new = (merged['_merge'] == 'left_only').to_numpy()
+    hash_differs = (merged[HASH_COLUMN] != merged[f'{HASH_COLUMN}_db']).fillna(True)
+    is_changed = ~is_new & hash_differs.to_numpy(dtype=bool)
+
+    new_rows = merged.loc[is_new, frame.columns]
+    changed_rows = merged.loc[is_changed, frame.columns]
+    inserted = bulk_insert(session, table, new_rows, loader=loader)
+    updated = write_in_batches(
+        session, table, changed_rows, lambda batch: update_frame(session.connection(), table, batch, keys), loader
+    )
+
+    return inserted, updated, int(len(frame) - is_new.sum() - is_changed.sum())
+
+# Escribir un DataFrame en la tabla: upsert por clave natural en modo incremental, inserción
+# en bloque si no. Devuelve la cantidad de filas procesadas ('loader' indica el archivo de rechazos
+# de las filas que la base no acepta)
+def write_frame(session, table, frame, incremental=False, scope=None, loader=None):
+    if not incremental:
+        # Si la tabla ya tiene la columna del hash se completa, así la próxima carga incremental omite estas filas
+        if HASH_COLUMN in table.c:
+            frame = frame.assign(**{HASH_COLUMN: compute_row_hashes(frame)})
+        return bulk_insert(session, table, frame, loader=loader)
+    inserted, updated, skipped = upsert_frame(session, table, frame, scope=scope, loader=loader)
+    log_event('upsert', table=table.name, inserted=inserted, updated=updated, skipped=skipped)
+    return inserted + updated + skipped
@@ -1,41 +1,18 @@
 import pandas as pd
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import unicodedata
-import os
-
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
-
-# Obtener la conexión a la base de datos
-def get_db_connection():
-    db_url = os.getenv('DATABASE_URL')
-    engine = create_engine(db_url)
-    return engine
-
-# Función para normalizar nombres (elimina acentos, convierte a minúsculas, elimina espacios extra)
-def normalize_name(name):
-    if pd.isnull(name):
-        return ''
-    # Convertir a minúsculas
-    name = name.lower()
-    # Eliminar acentos
-    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('utf-8')
-    # Eliminar espacios extra
-    name = ' '.join(name.split())
-    return name
+import sys
+from db_setup import get_db_connection, get_db_session, get_table
+from utils import normalize_names, build_frame, get_loader_parser, log_memory_report
+from sources import read_player_stats
+from incremental import write_frame
+from validation import validate_payload
+from metrics import tracked, write_rejects, clear_rejects, enable_profiling
 
 # Cargar y preparar los datos de MVP
 def load_and_prepare_mvp_csv(csv_path):
-    mvp_df = pd.read_csv(csv_path)
-    # Verificar los valores únicos en la columna 'MVP'
-    print("Valores únicos en la columna 'MVP':", mvp_df['MVP'].unique())
+    mvp_df = read_player_stats(csv_path, columns=['Player', 'Player_norm', 'season_key', 'MVP'])
     # Convertir la columna 'MVP' a booleano si es necesario
     if mvp_df['MVP'].dtype != bool:
         mvp_df['MVP'] = mvp_df['MVP'].astype(bool)
-    # Normalizar nombres de jugadores
-    mvp_df['Player_norm'] = mvp_df['Player'].apply(normalize_name)
     # Filtrar filas donde 'MVP' es True
     mvp_df = mvp_df[mvp_df['MVP'] == True]
     return mvp_df
@@ -44,7 +21,7 @@ def load_and_prepare_mvp_csv(csv_path):
 def get_players_dataframe():
     engine = get_db_connection()
     players_df = pd.read_sql_table('players', con=engine)
-    players_df['name_norm'] = players_df['name'].apply(normalize_name)
+    players_df['name_norm'] = normalize_names(players_df['name'])
     return players_df
 
 # Unir los datos de MVP con los jugadores para obtener el idPlayer
@@ -54,54 +31,63 @@ def merge_mvp_with_players(mvp_df, players_df):
 
 # Manejar jugadores que no se encontraron en la base de datos
 def handle_missing_players(merged_df):
-    missing_players = merged_df[merged_df['id'].isnull()]['Player'].unique()
-    if len(missing_players) > 0:
-        print("Jugadores no encontrados en la tabla 'players':")
-        for player in missing_players:
-            print(f"- {player}")
+    missing = merged_df['id'].isnull()
+    write_rejects('mvps', merged_df[missing], 'player_not_found', columns=['Player', 'season_key'])
     # Omitir jugadores sin ID
     merged_df = merged_df[merged_df['id'].notnull()]
     return merged_df
 
+# Mapeo de columnas de 'mvp': columna en la tabla -> (columna del CSV, tipo)
+MVP_COLUMNS = {
+    'idplayer': ('id', 'int64'),
+    'year': ('season_key', 'int64'),
+}
+
 # Preparar los datos para la inserción en la tabla 'mvp'
 def prepare_mvp_data(merged_df):
-    mvp_data = []
-    for _, row in merged_df.iterrows():
-        data = {
-            'idplayer': int(row['id']),
-            'year': row['Season'],
-        }
-        mvp_data.append(data)
-    return mvp_data
+    return build_frame(merged_df, MVP_COLUMNS)
 
 # Insertar los datos en la tabla 'mvp'
-def insert_mvp_data(mvp_data):
+def insert_mvp_data(mvp_data, incremental=False):
+    session = get_db_session()
     try:
-        engine = get_db_connection()
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        metadata = MetaData()
-        mvp_table = Table('mvp', metadata, autoload_with=engine)
-        session.execute(mvp_table.insert(), mvp_data)
+        mvp_table = get_table('mvp')
+        rows = write_frame(session, mvp_table, mvp_data, incremental, loader='mvps')
         session.commit()
-        print("Datos de MVP insertados correctamente en 'mvp'.")
-    except Exception as e:
-        print(f"Error al insertar datos de MVP: {e}")
+        return rows
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
 
-# Bloque principal para ejecutar todo el proceso
-if __name__ == '__main__':
+# Preparar el payload de la tabla sin insertarlo (también lo usa la escritura asíncrona)
+def prepare_payload(memory_report=False):
     # Ruta al CSV de estadísticas de jugadores
     STATS_CSV_PATH = 'data/NBA_Player_Stats.csv'
 
     # Cargar y preparar los datos de MVP
-    mvp_df = load_and_prepare_mvp_csv(STATS_CSV_PATH)
+    mvp_df = tracked('mvps', 'parse', load_and_prepare_mvp_csv, STATS_CSV_PATH)
     players_df = get_players_dataframe()
-    merged_df = merge_mvp_with_players(mvp_df, players_df)
-    merged_df = handle_missing_players(merged_df)
-    mvp_data = prepare_mvp_data(merged_df)
+    merged_df = tracked('mvps', 'merge', merge_mvp_with_players, mvp_df, players_df)
+    merged_df = tracked('mvps', 'reject_missing', handle_missing_players, merged_df)
+    mvp_data = tracked('mvps', 'prepare', prepare_mvp_data, merged_df)
+    mvp_data = tracked('mvps', 'validate', validate_payload, 'mvps', 'mvp', mvp_data)
+
+    if memory_report:
+        log_memory_report('mvps', {'MVPs': mvp_df, 'merge': merged_df, 'mvp': mvp_data})
+    return mvp_data
+
+# Bloque principal para ejecutar todo el proceso
+def main(argv=None):
+    args = get_loader_parser("Carga de MVPs").parse_args(argv or [])
+    clear_rejects('mvps')
+    enable_profiling(args.profile)
+    mvp_data = prepare_payload(args.memory_report)
 
     # Insertar en la base de datos
-    insert_mvp_data(mvp_data)
+    tracked('mvps', 'insert', insert_mvp_data, mvp_data, incremental=args.incremental)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
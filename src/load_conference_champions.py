@@ -1,104 +1,20 @@
 import pandas as pd
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import unicodedata
-import os
-
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
-
-# Obtener la conexión a la base de datos
-def get_db_connection():
-    db_url = os.getenv('DATABASE_URL')
-    engine = create_engine(db_url)
-    return engine
-
-# Función para normalizar nombres (elimina acentos, convierte a minúsculas, elimina espacios y puntos)
-def normalize_name(name):
-    if pd.isnull(name):
-        return ''
-    name = name.lower()
-    name = name.replace('.', '')  # Eliminar puntos
-    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('utf-8')
-    name = ' '.join(name.split())  # Eliminar espacios extra
-    return name.strip()
-
-# Diccionario de mapeo de nombres del Excel a nombres en la base de datos
-TEAM_NAME_MAPPING = {
-    'atlanta': 'Atlanta Hawks',
-    'st louis hawks': 'Atlanta Hawks',
-    'boston': 'Boston Celtics',
-    'brooklyn': 'Brooklyn Nets',
-    'new jersey': 'Brooklyn Nets',
-    'charlotte': 'Charlotte Hornets',
-    'charlotte bobcats': 'Charlotte Hornets',
-    'chicago': 'Chicago Bulls',
-    'cleveland': 'Cleveland Cavaliers',
-    'dallas': 'Dallas Mavericks',
-    'denver': 'Denver Nuggets',
-    'detroit': 'Detroit Pistons',
-    'fort wayne pistons': 'Detroit Pistons',
-    'golden state': 'Golden State Warriors',
-    'philadelphia warriors': 'Golden State Warriors',
-    'san francisco warriors': 'Golden State Warriors',
-    'houston': 'Houston Rockets',
-    'indiana': 'Indiana Pacers',
-    'la clippers': 'LA Clippers',
-    'los angeles clippers': 'LA Clippers',
-    'laclippers': 'LA Clippers',
-    'la lakers': 'Los Angeles Lakers',
-    'los angeles lakers': 'Los Angeles Lakers',
-    'lakers': 'Los Angeles Lakers',
-    'minneapolis lakers': 'Los Angeles Lakers',
-    'memphis': 'Memphis Grizzlies',
-    'vancouver': 'Memphis Grizzlies',
-    'miami': 'Miami Heat',
-    'milwaukee': 'Milwaukee Bucks',
-    'minnesota': 'Minnesota Timberwolves',
-    'new orleans': 'New Orleans Pelicans',
-    'new york': 'New York Knicks',
-    'oklahoma city': 'Oklahoma City Thunder',
-    'seattle': 'Oklahoma City Thunder',
-    'orlando': 'Orlando Magic',
-    'philadelphia': 'Philadelphia 76ers',
-    'syracuse nationals': 'Philadelphia 76ers',
-    'phoenix': 'Phoenix Suns',
-    'portland': 'Portland Trail Blazers',
-    'sacramento': 'Sacramento Kings',
-    'rochester royals': 'Sacramento Kings',
-    'cincinnati royals': 'Sacramento Kings',
-    'kansas city kings': 'Sacramento Kings',
-    'san antonio': 'San Antonio Spurs',
-    'toronto': 'Toronto Raptors',
-    'utah': 'Utah Jazz',
-    'new orleans jazz': 'Utah Jazz',
-    'washington': 'Washington Wizards',
-    'baltimore bullets': 'Washington Wizards',
-    'washington bullets': 'Washington Wizards',
-    'new jersey nets': 'Brooklyn Nets',
-    'seattle supersonics': 'Oklahoma City Thunder',
-}
-
-# Función para mapear nombres de equipos
-def map_team_name(name):
-    normalized_name = normalize_name(name)
-    mapped_name = TEAM_NAME_MAPPING.get(normalized_name)
-    if mapped_name:
-        return normalize_name(mapped_name)
-    else:
-        return normalized_name  # Devolver el nombre normalizado si no se encuentra en el mapeo
+import sys
+from db_setup import get_db_connection, get_db_session, get_table
+from utils import normalize_names, build_frame, get_loader_parser, log_memory_report
+from sources import read_finals_excel
+from franchises import resolve_franchises
+from incremental import write_frame
+from validation import validate_payload
+from metrics import tracked, write_rejects, clear_rejects, enable_profiling
 
 # Leer y preparar el Excel de campeones de conferencia
 def load_and_prepare_conference_champions_excel(excel_path):
-    # Leer el archivo Excel
-    df = pd.read_excel(excel_path, engine='openpyxl')
-
-    # Mantener solo las columnas relevantes
-    df = df[['Year', 'Western Champion', 'Eastern Champion']]
+    # Leer del archivo Excel solo las columnas relevantes
+    df = read_finals_excel(excel_path, columns=['season_key', 'Western Champion', 'Eastern Champion'])
 
     # Transformar el DataFrame para tener una fila por equipo
-    df_melted = df.melt(id_vars=['Year'], value_vars=['Western Champion', 'Eastern Champion'],
+    df_melted = df.melt(id_vars=['season_key'], value_vars=['Western Champion', 'Eastern Champion'],
                         var_name='Conference', value_name='Team')
 
     # Mapear 'Western Champion' y 'Eastern Champion' a 'West' y 'East'
@@ -107,8 +23,8 @@ def load_and_prepare_conference_champions_excel(excel_path):
         'Eastern Champion': 'East'
     })
 
-    # Normalizar y mapear nombres de equipos
-    df_melted['Team_norm'] = df_melted['Team'].apply(map_team_name)
+    # Resolver la franquicia según el nombre y el año
+    df_melted['Team_norm'] = normalize_names(resolve_franchises(df_melted['Team'], df_melted['season_key']))
 
     return df_melted
 
@@ -116,7 +32,7 @@ def load_and_prepare_conference_champions_excel(excel_path):
 def get_teams_dataframe():
     engine = get_db_connection()
     teams_df = pd.read_sql_table('teams', con=engine)
-    teams_df['name_norm'] = teams_df['name'].apply(normalize_name)
+    teams_df['name_norm'] = normalize_names(teams_df['name'])
     return teams_df
 
 # Unir los campeones de conferencia con los equipos para obtener el idTeam
@@ -126,57 +42,68 @@ def merge_conference_champions_with_teams(df_champions, teams_df):
 
 # Manejar equipos que no se encontraron en la base de datos
 def handle_missing_teams(merged_df):
-    missing_teams = merged_df[merged_df['id'].isnull()]['Team'].unique()
-    if len(missing_teams) > 0:
-        print("Equipos no encontrados en la tabla 'teams':")
-        for team in missing_teams:
-            print(f"- '{team}'")
-    else:
-        print("Todos los equipos fueron mapeados correctamente.")
+    missing = merged_df['id'].isnull()
+    write_rejects('conference_champions', merged_df[missing], 'team_not_found', columns=['Team', 'season_key'])
     # Omitir equipos sin ID
     merged_df = merged_df[merged_df['id'].notnull()]
     return merged_df
 
+# Mapeo de columnas de 'conference_champions': columna en la tabla -> (columna del Excel, tipo)
+CONFERENCE_CHAMPIONS_COLUMNS = {
+    'idteam': ('id', 'int64'),
+    'year': ('season_key', 'int64'),
+    'conference': ('Conference', None),
+}
+
 # Preparar los datos para la inserción en la tabla 'conference_champions'
 def prepare_conference_champions_data(merged_df):
-    champions_data = []
-    for _, row in merged_df.iterrows():
-        data = {
-            'idteam': int(row['id']),
-            'year': str(row['Year']),
-            'conference': row['Conference']
-        }
-        champions_data.append(data)
-    return champions_data
+    return build_frame(merged_df, CONFERENCE_CHAMPIONS_COLUMNS)
 
 # Insertar los datos en la tabla 'conference_champions'
-def insert_conference_champions(champions_data):
+def insert_conference_champions(champions_data, incremental=False):
+    session = get_db_session()
     try:
-        engine = get_db_connection()
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        metadata = MetaData()
-        conference_champions_table = Table('conference_champions', metadata, autoload_with=engine)
-        session.execute(conference_champions_table.insert(), champions_data)
+        conference_champions_table = get_table('conference_champions')
+        rows = write_frame(session, conference_champions_table, champions_data, incremental, loader='conference_champions')
         session.commit()
-        print("Datos de campeones de conferencia insertados correctamente en 'conference_champions'.")
-    except Exception as e:
-        print(f"Error al insertar datos de campeones de conferencia: {e}")
+        return rows
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
 
-# Bloque principal para ejecutar todo el proceso
-if __name__ == '__main__':
+# Preparar el payload de la tabla sin insertarlo (también lo usa la escritura asíncrona)
+def prepare_payload(memory_report=False):
     # Ruta al archivo Excel que contiene los datos de campeones de conferencia
     EXCEL_PATH = 'data/NBA Finals and MVP.xlsx'  # Ajusta la ruta según sea necesario
 
     # Cargar y preparar los datos
-    conference_champions_df = load_and_prepare_conference_champions_excel(EXCEL_PATH)
+    conference_champions_df = tracked('conference_champions', 'parse', load_and_prepare_conference_champions_excel, EXCEL_PATH)
     teams_df = get_teams_dataframe()
-    merged_df = merge_conference_champions_with_teams(conference_champions_df, teams_df)
-    merged_df = handle_missing_teams(merged_df)
-    champions_data = prepare_conference_champions_data(merged_df)
+    merged_df = tracked('conference_champions', 'merge', merge_conference_champions_with_teams, conference_champions_df, teams_df)
+    merged_df = tracked('conference_champions', 'reject_missing', handle_missing_teams, merged_df)
+    champions_data = tracked('conference_champions', 'prepare', prepare_conference_champions_data, merged_df)
+    champions_data = tracked('conference_champions', 'validate', validate_payload, 'conference_champions', 'conference_champions', champions_data)
+
+    if memory_report:
+        log_memory_report('conference_champions', {
+            'Excel': conference_champions_df,
+            'merge': merged_df,
+            'conference_champions': champions_data,
+        })
+    return champions_data
+
+# Bloque principal para ejecutar todo el proceso
+def main(argv=None):
+    args = get_loader_parser("Carga de campeones de conferencia").parse_args(argv or [])
+    clear_rejects('conference_champions')
+    enable_profiling(args.profile)
+    champions_data = prepare_payload(args.memory_report)
 
     # Insertar en la base de datos
-    insert_conference_champions(champions_data)
+    tracked('conference_champions', 'insert', insert_conference_champions, champions_data, incremental=args.incremental)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
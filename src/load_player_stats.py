@@ -1,123 +1,299 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import logging
 import pandas as pd
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import unicodedata
+import time
+import sys
 import os
+from sqlalchemy import Integer
+from db_setup import get_db_connection, get_db_session, get_table
+from utils import normalize_names, build_frame, get_loader_parser, log_memory_report
+from sources import read_player_stats, PLAYER_STATS_DTYPES
+from seasons import season_keys
+from franchises import resolve_team_ids
+from incremental import write_frame, ensure_column, ensure_hash_column
+from validation import validate_frame, validate_payload
+from metrics import log_event, tracked, track_stage, write_rejects, clear_rejects, enable_profiling
 
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
+# Cantidad de filas por bloque en el modo streaming
+CHUNK_SIZE = int(os.getenv('STATS_CHUNK_SIZE', '2000'))
 
-# Obtener la conexión a la base de datos
-def get_db_connection():
-    db_url = os.getenv('DATABASE_URL')
-    engine = create_engine(db_url)
-    return engine
+# Ruta al CSV de estadísticas
+STATS_CSV_PATH = 'data/NBA_Player_Stats.csv'
 
+# Reintentos de cada temporada que falla en el modo paralelo
+PARALLEL_RETRIES = int(os.getenv('STATS_PARALLEL_RETRIES', '1'))
+
+# Columnas de los jugadores no encontrados que se guardan en los rechazos
+REJECT_COLUMNS = ['Player', 'Tm', 'season_key']
 
 def get_players_dataframe():
     engine = get_db_connection()
     players_df = pd.read_sql_table('players', con=engine)
     return players_df
 
-def normalize_name(name):
-    if pd.isnull(name):
-        return ''
-    # Convertir a minúsculas
-    name = name.lower()
-    # Eliminar acentos
-    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('utf-8')
-    # Eliminar espacios extra
-    name = ' '.join(name.split())
-    return name
+def get_teams_dataframe():
+    engine = get_db_connection()
+    return pd.read_sql_table('teams', con=engine)
+
+# Resolver el equipo de cada fila (abreviatura y temporada) con la tabla de franquicias.
+# 'TOT' (la suma de un jugador que cambió de equipo en la temporada) no es un equipo y queda nulo
+def resolve_stats_teams(stats_df, teams_df):
+    return stats_df.assign(idteam=resolve_team_ids(stats_df['Tm'], stats_df['season_key'], teams_df))
 
 def load_and_prepare_stats_csv(csv_path):
-    stats_df = pd.read_csv(csv_path)
-    stats_df['Player_norm'] = stats_df['Player'].apply(normalize_name)
+    stats_df = read_player_stats(csv_path, columns=STATS_SOURCE_COLUMNS + ['Player_norm'])
     return stats_df
 
 def merge_stats_with_players(stats_df, players_df):
-    players_df['name_norm'] = players_df['name'].apply(normalize_name)
-    merged_df = stats_df.merge(players_df, left_on='Player_norm', right_on='name_norm', how='left')
+    # Solo se agrega el id: el nombre ya está en 'Player'
+    players_df = players_df[['id']].assign(Player_norm=normalize_names(players_df['name']))
+    merged_df = stats_df.merge(players_df, on='Player_norm', how='left')
     return merged_df
 
 def handle_missing_players(merged_df):
-    missing_players = merged_df[merged_df['id'].isnull()]['Player'].unique()
-    if len(missing_players) > 0:
-        print("Jugadores no encontrados en la tabla 'players':")
-        for player in missing_players:
-            print(player)
+    missing = merged_df['id'].isnull()
+    write_rejects('player_stats', merged_df[missing], 'player_not_found', columns=REJECT_COLUMNS)
     # Omitir jugadores sin ID
     merged_df = merged_df[merged_df['id'].notnull()]
     return merged_df
 
 
+# Mapeo de columnas de 'players_stats': columna en la tabla -> (columna del CSV, tipo)
+PLAYERS_STATS_COLUMNS = {
+    'id_player': ('id', 'int64'),
+    'year': ('season_key', 'int64'),
+    'team': ('Tm', 'str'),
+    'idteam': ('idteam', 'Int64'),
+    'games': ('G', 'float64'),
+    'games_started': ('GS', 'float64'),
+    'minutes_played': ('MP', 'float64'),
+    'fg': ('FG', 'float64'),
+    'fga': ('FGA', 'float64'),
+    'fg_percentage': ('FG%', 'float64'),
+    'three_points': ('3P', 'float64'),
+    'three_pa': ('3PA', 'float64'),
+    'three_p_percentage': ('3P%', 'float64'),
+    'two_points': ('2P', 'float64'),
+    'two_pa': ('2PA', 'float64'),
+    'two_p_percentage': ('2P%', 'float64'),
+    'efg_percentage': ('eFG%', 'float64'),
+    'ft': ('FT', 'float64'),
+    'fta': ('FTA', 'float64'),
+    'ft_percentage': ('FT%', 'float64'),
+    'orb': ('ORB', 'float64'),
+    'drb': ('DRB', 'float64'),
+    'trb': ('TRB', 'float64'),
+    'ast': ('AST', 'float64'),
+    'stl': ('STL', 'float64'),
+    'blk': ('BLK', 'float64'),
+    'tov': ('TOV', 'float64'),
+    'pf': ('PF', 'float64'),
+    'pts': ('PTS', 'float64'),
+    'season': ('season_key', 'int64'),
+}
+
+# Columnas que se leen del CSV de estadísticas
+STATS_SOURCE_COLUMNS = ['Player'] + list(dict.fromkeys(
+    source for source, _ in PLAYERS_STATS_COLUMNS.values() if source not in ('id', 'idteam')
+))
+
 def prepare_players_stats_data(merged_df):
-    players_stats_data = []
-    for _, row in merged_df.iterrows():
-        data = {
-            'id_player': int(row['id']),
-            'year': row['Season'],
-            'team': row['Tm'],
-            'games': row['G'],
-            'games_started': row['GS'],
-            'minutes_played': row['MP'],
-            'fg': row['FG'],
-            'fga': row['FGA'],
-            'fg_percentage': row['FG%'],
-            'three_points': row['3P'],
-            'three_pa': row['3PA'],
-            'three_p_percentage': row['3P%'],
-            'two_points': row['2P'],
-            'two_pa': row['2PA'],
-            'two_p_percentage': row['2P%'],
-            'efg_percentage': row['eFG%'],
-            'ft': row['FT'],
-            'fta': row['FTA'],
-            'ft_percentage': row['FT%'],
-            'orb': row['ORB'],
-            'drb': row['DRB'],
-            'trb': row['TRB'],
-            'ast': row['AST'],
-            'stl': row['STL'],
-            'blk': row['BLK'],
-            'tov': row['TOV'],
-            'pf': row['PF'],
-            'pts': row['PTS'],
-            'season': row['Season'],
-        }
-        players_stats_data.append(data)
-    return players_stats_data
+    return build_frame(merged_df, PLAYERS_STATS_COLUMNS)
+
+# Tabla 'players_stats'. En una base creada antes de que existiera 'idteam' se agrega la columna
+# (sin la clave foránea, que agrega 'python src/schema.py --create')
+def get_players_stats_table():
+    table = get_table('players_stats')
+    ensure_column(get_db_connection(), table, 'idteam', Integer())
+    return table
+
+# Diccionario nombre normalizado -> id de jugador, para resolver los ids bloque por bloque
+def get_players_id_map(players_df):
+    return pd.Series(players_df['id'].to_numpy(), index=normalize_names(players_df['name'])).to_dict()
+
+# Modo streaming: leer el CSV por bloques, resolver los ids e insertar y confirmar cada bloque
+# (con 'memory_report' se informa la memoria de los DataFrames de cada bloque)
+def load_players_stats_streaming(csv_path, players_id_map, chunk_size=None, incremental=False, memory_report=False):
+    total = 0
+    teams_df = get_teams_dataframe()
+    session = get_db_session()
+    try:
+        players_stats_table = get_players_stats_table()
+        usecols = [column for column in STATS_SOURCE_COLUMNS if column != 'season_key'] + ['Season']
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size or CHUNK_SIZE, usecols=usecols, dtype=PLAYER_STATS_DTYPES):
+            chunk['Player_norm'] = normalize_names(chunk['Player'])
+            chunk['season_key'] = season_keys(chunk['Season'])
+            chunk['id'] = chunk['Player_norm'].map(players_id_map)
+            chunk = resolve_stats_teams(chunk, teams_df)
+            with track_stage('player_stats', 'chunk', len(chunk)) as metrics:
+                chunk = handle_missing_players(chunk)
+                players_stats_data = prepare_players_stats_data(chunk)
+                # La unicidad de la clave solo se puede controlar dentro del bloque
+                players_stats_data = validate_payload('player_stats', 'players_stats', players_stats_data)
+                if memory_report:
+                    log_memory_report('player_stats', {'chunk': chunk, 'players_stats': players_stats_data})
+                # En modo incremental solo se leen de la base los hashes de las temporadas del bloque
+                scope = {'season': [int(season) for season in players_stats_data['season'].unique()]}
+                metrics['rows_out'] = write_frame(session, players_stats_table, players_stats_data, incremental,
+                                                  scope=scope, loader='player_stats')
+                session.commit()
+            total += metrics['rows_out']
+        return total
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
-def insert_players_stats(players_stats_data):
+def insert_players_stats(players_stats_data, incremental=False):
+    session = get_db_session()
     try:
-        engine = get_db_connection()
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        metadata = MetaData()
-        players_stats_table = Table('players_stats', metadata, autoload_with=engine)
-        session.execute(players_stats_table.insert(), players_stats_data)
+        players_stats_table = get_players_stats_table()
+        rows = write_frame(session, players_stats_table, players_stats_data, incremental, loader='player_stats')
         session.commit()
-        print("Estadísticas de jugadores insertadas correctamente en 'players_stats'.")
-    except Exception as e:
-        print(f"Error al insertar estadísticas de jugadores: {e}")
+        return rows
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
 
-if __name__ == '__main__':
-    # Ruta al CSV de estadísticas
-    STATS_CSV_PATH = 'data/NBA_Player_Stats.csv'
-    
-    # Cargar y preparar los datos
-    players_stats_df = load_and_prepare_stats_csv(STATS_CSV_PATH)
+# Procesar una temporada en un proceso worker: resolver los ids, armar el payload e insertarlo
+# en su propia conexión y transacción. Los rechazos se devuelven para que los escriba el proceso padre
+def load_season_partition(season, partition, players_id_map, incremental=False):
+    start = time.perf_counter()
+    partition = partition.assign(id=partition['Player_norm'].map(players_id_map))
+    missing = partition['id'].isnull()
+    players_stats_data = prepare_players_stats_data(partition[~missing])
+    players_stats_data, invalid, violations = validate_frame(players_stats_data, 'players_stats')
+
+    session = get_db_session()
+    try:
+        players_stats_table = get_players_stats_table()
+        rows = write_frame(session, players_stats_table, players_stats_data, incremental, scope={'season': season},
+                           loader='player_stats')
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return {
+        'rows': rows,
+        'rejected': partition.loc[missing, REJECT_COLUMNS],
+        'invalid': invalid,
+        'violations': {rule: count for rule, count in violations.items() if count},
+        'elapsed_s': round(time.perf_counter() - start, 4),
+    }
+
+# Modo paralelo: una partición por temporada en un pool de procesos. Cada temporada se confirma
+# por separado, así que una que falla se reintenta sola (hasta 'retries' veces) sin repetir las demás
+def load_players_stats_parallel(stats_df, players_id_map, workers, incremental=False, retries=None):
+    retries = PARALLEL_RETRIES if retries is None else retries
+    # Las columnas que falten se agregan una sola vez, antes de que los workers escriban en paralelo
+    players_stats_table = get_players_stats_table()
+    if incremental:
+        ensure_hash_column(get_db_connection(), players_stats_table)
+
+    partitions = {int(season): partition for season, partition in stats_df.groupby('season_key', observed=True)}
+    loaded = {}
+    errors = {}
+    pending = sorted(partitions)
+    # 'spawn': el proceso padre puede tener hilos (pipeline) y conexiones abiertas que no se deben heredar
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        for attempt in range(1, retries + 2):
+            if not pending:
+                break
+            futures = {
+                executor.submit(load_season_partition, season, partitions[season], players_id_map, incremental): season
+                for season in pending
+            }
+            pending = []
+            for future in as_completed(futures):
+                season = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors[season] = str(e)
+                    pending.append(season)
+                    log_event('partition_failed', level=logging.ERROR, loader='player_stats', season=season,
+                              attempt=attempt, error=str(e))
+                    continue
+                errors.pop(season, None)
+                loaded[season] = result['rows']
+                rejected = write_rejects('player_stats', result['rejected'], 'player_not_found')
+                rejected += write_rejects('player_stats', result['invalid'], 'validation_failed')
+                log_event('partition', loader='player_stats', season=season, attempt=attempt, rows_in=len(partitions[season]),
+                          rows_out=result['rows'], rejected=rejected, violations=result['violations'],
+                          elapsed_s=result['elapsed_s'])
+
+    if errors:
+        raise RuntimeError(f"No se pudieron cargar las temporadas {sorted(errors)} (reintentar con --seasons)")
+    return sum(loaded.values())
+
+# Leer las estadísticas, opcionalmente solo de algunas temporadas
+def load_stats_for_seasons(csv_path, seasons=None):
+    players_stats_df = tracked('player_stats', 'parse', load_and_prepare_stats_csv, csv_path)
+    if seasons:
+        players_stats_df = players_stats_df[players_stats_df['season_key'].isin(seasons)]
+    return players_stats_df
+
+# Preparar el payload de la tabla sin insertarlo (también lo usa la escritura asíncrona)
+def prepare_payload(memory_report=False, seasons=None):
+    # Antes de que la escritura asíncrona refleje la tabla
+    get_players_stats_table()
+    players_stats_df = load_stats_for_seasons(STATS_CSV_PATH, seasons)
+    players_stats_df = tracked('player_stats', 'resolve_teams', resolve_stats_teams, players_stats_df, get_teams_dataframe())
     players_df = get_players_dataframe()
-    merged_df = merge_stats_with_players(players_stats_df, players_df)
-    merged_df = handle_missing_players(merged_df)
-    merged_df.to_csv('data/NBA_Player_Stats_Out.csv', index=False)
-    players_stats_data = prepare_players_stats_data(merged_df)
-    
+    merged_df = tracked('player_stats', 'merge', merge_stats_with_players, players_stats_df, players_df)
+    merged_df = tracked('player_stats', 'reject_missing', handle_missing_players, merged_df)
+    players_stats_data = tracked('player_stats', 'prepare', prepare_players_stats_data, merged_df)
+    players_stats_data = tracked('player_stats', 'validate', validate_payload, 'player_stats', 'players_stats', players_stats_data)
+
+    if memory_report:
+        log_memory_report('player_stats', {
+            'NBA_Player_Stats.csv': players_stats_df,
+            'merge': merged_df,
+            'players_stats': players_stats_data,
+        })
+    return players_stats_data
+
+def main(argv=None):
+    parser = get_loader_parser("Carga de estadísticas de jugadores")
+    parser.add_argument('--stream', action='store_true', help="Leer e insertar el CSV por bloques")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Filas por bloque en modo streaming")
+    parser.add_argument('--parallel', type=int, metavar='WORKERS', help="Cargar cada temporada en paralelo con WORKERS procesos")
+    parser.add_argument('--retries', type=int, default=PARALLEL_RETRIES, help="Reintentos por temporada en modo paralelo")
+    parser.add_argument('--seasons', type=int, nargs='+', metavar='SEASON',
+                        help="Cargar solo estas temporadas (año de finalización); con --incremental sirve para reintentar una")
+    args = parser.parse_args(argv or [])
+    clear_rejects('player_stats')
+    enable_profiling(args.profile)
+
+    if args.stream and (args.parallel or args.seasons):
+        parser.error("--stream no se puede combinar con --parallel ni --seasons")
+
+    if args.stream:
+        players_id_map = get_players_id_map(get_players_dataframe())
+        tracked('player_stats', 'stream', load_players_stats_streaming, STATS_CSV_PATH, players_id_map, args.chunk_size,
+                args.incremental, args.memory_report)
+        return
+
+    if args.parallel:
+        players_stats_df = load_stats_for_seasons(STATS_CSV_PATH, args.seasons)
+        players_stats_df = tracked('player_stats', 'resolve_teams', resolve_stats_teams, players_stats_df, get_teams_dataframe())
+        players_id_map = get_players_id_map(get_players_dataframe())
+        tracked('player_stats', 'parallel', load_players_stats_parallel, players_stats_df, players_id_map,
+                args.parallel, args.incremental, args.retries)
+        return
+
+    players_stats_data = prepare_payload(args.memory_report, args.seasons)
+
     # Insertar en la base de datos
-    insert_players_stats(players_stats_data)
+    tracked('player_stats', 'insert', insert_players_stats, players_stats_data, incremental=args.incremental)
 
-    
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
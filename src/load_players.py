@@ -1,33 +1,22 @@
 import pandas as pd
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import unicodedata
-import os
-
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
-
-# Obtener la conexión a la base de datos
-def get_db_connection():
-    db_url = os.getenv('DATABASE_URL')
-    engine = create_engine(db_url)
-    return engine
+import sys
+from db_setup import get_db_connection, get_db_session, get_table
+from utils import build_frame, get_loader_parser, log_memory_report
+from sources import read_player_stats, read_player_ids
+from crosswalk import build_player_crosswalk, insert_player_crosswalk
+from player_resolution import build_player_index, resolve_players, estimate_birth_years
+from incremental import write_frame
+from metrics import log_event, tracked, track_stage, profile_stage, write_rejects, clear_rejects, enable_profiling
 
 def insert_player(name, position, nba_id, session=None):
+    session_created = False
     try:
         if session is None:
-            engine = get_db_connection()
-            # Crear la sesión
-            Session = sessionmaker(bind=engine)
-            session = Session()
+            session = get_db_session()
             session_created = True
-        else:
-            session_created = False
 
-        # Crear los metadatos y acceder a la tabla 'players'
-        metadata = MetaData()
-        players = Table('players', metadata, autoload_with=session.bind)
+        # Acceder a la tabla 'players' (definición en caché)
+        players = get_table('players')
 
         # Crear la inserción
         insert_query = players.insert().values(name=name, position=position, nba_id=nba_id)
@@ -37,42 +26,46 @@ def insert_player(name, position, nba_id, session=None):
 
         if session_created:
             session.commit()
-            print(f"Jugador {name} insertado correctamente en la tabla 'players'.")
-    except Exception as e:
-        print(f"Error al insertar el jugador {name}: {e}")
+            log_event('insert', table='players', player=name)
+    except Exception:
         if session_created:
             session.rollback()
+        raise
     finally:
         if session_created:
             session.close()
 
 
-def insert_players(players_df):
+# Columnas que se leen de cada fuente
+STATS_SOURCE_COLUMNS = ['Player', 'Pos', 'Age', 'Season']
+IDS_SOURCE_COLUMNS = [
+    'BBRefName', 'BBRefID', 'BBRefBirthDate', 'NBAName', 'NBAID', 'NBABirthDate',
+    'ESPNName', 'ESPNID', 'SpotracName', 'SpotracID',
+]
+
+# Mapeo de columnas de 'players': columna en la tabla -> (columna del DataFrame, tipo)
+PLAYERS_COLUMNS = {
+    'name': ('Player', None),
+    'position': ('Pos', None),
+    'nba_id': ('NBAID', 'int64'),
+}
+
+def insert_players(players_df, incremental=False):
+    session = get_db_session()
     try:
-        engine = get_db_connection()
-        # Crear la sesión
-        Session = sessionmaker(bind=engine)
-        session = Session()
-
-        # Crear los metadatos y acceder a la tabla 'players'
-        metadata = MetaData()
-        players_table = Table('players', metadata, autoload_with=engine)
-
-        # Preparar una lista de diccionarios con los datos de los jugadores
-        players_data = []
-        for index, row in players_df.iterrows():
-            name = row['Player']
-            position = row['Pos']
-            nba_id = row['NBAID']
-            players_data.append({'name': name, 'position': position, 'nba_id': nba_id})
+        # Acceder a la tabla 'players' (definición en caché)
+        players_table = get_table('players')
+
+        # Preparar el DataFrame con las columnas de la tabla
+        players_data = build_frame(players_df, PLAYERS_COLUMNS)
 
         # Ejecutar la inserción en bloque
-        session.execute(players_table.insert(), players_data)
+        rows = write_frame(session, players_table, players_data, incremental, loader='players')
         session.commit()
-        print("Todos los jugadores fueron insertados correctamente en la tabla 'players'.")
-    except Exception as e:
-        print(f"Error al insertar los jugadores: {e}")
+        return rows
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
 
@@ -87,6 +80,21 @@ def find_players_with_concatenated_positions(players_csv):
     return player_positions
 
 
+# Materializar la tabla 'player_ids' a partir de los jugadores cargados y el CSV de IDs
+def insert_player_ids(ids_df):
+    session = get_db_session()
+    try:
+        players_db_df = pd.read_sql_table('players', con=get_db_connection())
+        crosswalk_df = build_player_crosswalk(players_db_df, ids_df)
+        insert_player_crosswalk(session, crosswalk_df)
+        session.commit()
+        return len(crosswalk_df)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
 # Función para asignar null a los jugadores con múltiples NBA IDs
 def nullify_conflicting_nba_ids(df):
     # Agrupar por 'Player' y contar cuántos NBAID únicos tiene cada jugador
@@ -100,105 +108,65 @@ def nullify_conflicting_nba_ids(df):
 
     return df
 
-def clean_player_names(df, column):
-    df = df.copy()  # Evitar SettingWithCopyWarning
-
-    # Llenar valores faltantes con cadena vacía
-    df[column] = df[column].fillna('')
-
-    # Asegurar que todos los valores sean de tipo string
-    df[column] = df[column].astype(str)
-
-    # Eliminar asteriscos y espacios en blanco
-    df[column] = df[column].str.replace('*', '', regex=False).str.strip()
-
-    # Eliminar puntos y apóstrofes
-    df[column] = df[column].str.replace('.', '', regex=False).str.replace("'", '', regex=False)
-
-    # Convertir a minúsculas
-    df[column] = df[column].str.lower()
-
-    # Normalizar caracteres Unicode (eliminar acentos)
-    df[column] = df[column].apply(lambda x: unicodedata.normalize('NFKD', x).encode('ASCII', 'ignore').decode('ASCII'))
-
-    return df
-
+# Resolver el NBAID de cada jugador contra el CSV de IDs (exacto, sin sufijos o aproximado,
+# desempatando por año de nacimiento cuando se conoce)
+def mergeData(players_with_positions, nba_ids, birth_years=None):
+    index = build_player_index(nba_ids)
+    if birth_years is not None:
+        birth_years = players_with_positions['Player'].map(birth_years)
+    players_with_positions['NBAID'] = resolve_players(index, players_with_positions['Player'], birth_years)
 
+    # Los jugadores sin NBAID se cargan igual (con -1), pero quedan registrados en los rechazos
+    missing = players_with_positions[players_with_positions['NBAID'].isna()]
+    write_rejects('players', missing, 'nba_id_not_found', columns=['Player', 'Pos'])
 
-def mergeData(players_with_positions, nba_ids):
-    # Almacenar el nombre original del jugador
-    players_with_positions['OriginalName'] = players_with_positions['Player']
-    
-    # Limpiar nombres de jugadores en ambos DataFrames
-    players_with_positions = clean_player_names(players_with_positions, 'Player')
-    nba_ids = clean_player_names(nba_ids, 'NBAName')
-    
-    # Asegurar que los nombres sean de tipo string
-    players_with_positions['Player'] = players_with_positions['Player'].astype(str)
-    nba_ids['NBAName'] = nba_ids['NBAName'].astype(str)
-    
-    # Crear un diccionario para acceso rápido
-    nba_ids_dict = nba_ids.set_index('NBAName')['NBAID'].to_dict()
-    
-    # Lista para almacenar los NBAIDs correspondientes
-    nba_id_list = []
-    
-    # Iterar sobre cada jugador en 'players_with_positions'
-    for index, row in players_with_positions.iterrows():
-        player_name = row['Player']
-        nba_id = nba_ids_dict.get(player_name)
-    
-        if nba_id is None:
-            print(f"No se encontró NBAID para el jugador: {row['Player']}")
-    
-        nba_id_list.append(nba_id)
-    
-    # Agregar la lista de NBAIDs al DataFrame 'players_with_positions'
-    players_with_positions['NBAID'] = nba_id_list
-    
-    # Restaurar los nombres originales
-    players_with_positions['Player'] = players_with_positions['OriginalName']
-    
-    # Eliminar la columna 'OriginalName' si ya no es necesaria
-    players_with_positions.drop(columns=['OriginalName'], inplace=True)
-    
     return players_with_positions
 
 
+def main(argv=None):
+    args = get_loader_parser("Carga de jugadores").parse_args(argv or [])
+    clear_rejects('players')
+    enable_profiling(args.profile)
 
-if __name__ == '__main__':
     # Cargar los archivos CSV
-    PLAYERS_CSV = pd.read_csv('data/NBA_Player_Stats.csv', delimiter=',')
-    NBA_ID_PLAYERS_CSV = pd.read_csv('./data/NBA_Player_IDs.csv', delimiter=',', encoding='ISO-8859-1')
+    PLAYERS_CSV = tracked('players', 'parse', read_player_stats, 'data/NBA_Player_Stats.csv', columns=STATS_SOURCE_COLUMNS)
+    NBA_ID_PLAYERS_CSV = tracked('players', 'parse_ids', read_player_ids, 'data/NBA_Player_IDs.csv', columns=IDS_SOURCE_COLUMNS)
 
-    # Obtener los jugadores con posiciones concatenadas
-    players_with_positions = find_players_with_concatenated_positions(PLAYERS_CSV)
+    # Obtener los jugadores con posiciones concatenadas (agrupa las filas por jugador, no descarta ninguna)
+    with track_stage('players', 'group_positions', len(PLAYERS_CSV)) as metrics, profile_stage('players', 'group_positions'):
+        players_with_positions = find_players_with_concatenated_positions(PLAYERS_CSV)
+        metrics.update(rows_out=len(players_with_positions), rejected=0)
 
-    # Obtener los nombres de los jugadores y sus IDs de la NBA
-    nba_ids = NBA_ID_PLAYERS_CSV[['NBAName', 'NBAID']]
+    # Obtener los nombres de los jugadores, sus IDs de la NBA y las fechas de nacimiento
+    nba_ids = NBA_ID_PLAYERS_CSV[['BBRefName', 'BBRefBirthDate', 'NBAName', 'NBAID', 'NBABirthDate']]
+
+    # Estimar el año de nacimiento de cada jugador (para desempatar homónimos)
+    birth_years = estimate_birth_years(PLAYERS_CSV)
 
-    print(players_with_positions.head())
     # Unir los DataFrames
-    players_with_positions = mergeData(players_with_positions, nba_ids)
+    players_with_positions = tracked('players', 'merge', mergeData, players_with_positions, nba_ids, birth_years)
 
-    print(players_with_positions.head())
     # Asignar null a los jugadores que tienen más de un NBA ID
     players_with_positions_cleaned = nullify_conflicting_nba_ids(players_with_positions)
 
-    # Imprimir el resultado final
-    print(players_with_positions_cleaned[['Player', 'NBAID']].head())
-
-    # Guardar los datos preprocesados (opcional)
-    players_with_positions_cleaned.to_csv('data/NBA_Player_Stats_cleaned.csv', index=False)
-    
-
     # Convertir NBAID a enteros, manejando NaN como None
-    players_with_positions_cleaned['NBAID'] = players_with_positions_cleaned['NBAID'].apply(lambda x: int(x) if pd.notnull(x) else int(-1))
+    players_with_positions_cleaned['NBAID'] = players_with_positions_cleaned['NBAID'].fillna(-1).astype('int64')
 
-    # Imprimir el resultado final
-    print(players_with_positions_cleaned[['Player', 'NBAID']].head())
-    # Guardar los datos preprocesados (opcional)
-    players_with_positions_cleaned.to_csv('data/NBA_Player_Stats_cleaned.csv', index=False)
+    if args.memory_report:
+        log_memory_report('players', {
+            'NBA_Player_Stats.csv': PLAYERS_CSV,
+            'NBA_Player_IDs.csv': NBA_ID_PLAYERS_CSV,
+            'players': players_with_positions_cleaned,
+        })
 
     # Insertar los jugadores en la base de datos
-    insert_players(players_with_positions_cleaned)
\ No newline at end of file
+    tracked('players', 'insert', insert_players, players_with_positions_cleaned, incremental=args.incremental)
+
+    # Guardar las equivalencias entre el id interno y los ids de cada fuente. Las filas escritas salen de
+    # los jugadores cargados y no del CSV de IDs, así que no se informan como entrada ni como rechazos
+    with track_stage('players', 'insert_ids') as metrics, profile_stage('players', 'insert_ids'):
+        metrics['rows_out'] = insert_player_ids(NBA_ID_PLAYERS_CSV)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
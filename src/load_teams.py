@@ -1,32 +1,19 @@
 import pandas as pd
-from sqlalchemy import create_engine, Table, MetaData
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
-
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
-
-# Obtener la conexión a la base de datos
-def get_db_connection():
-    db_url = os.getenv('DATABASE_URL')
-    engine = create_engine(db_url)
-    return engine
+import sys
+from db_setup import get_db_session, get_table
+from utils import build_frame, get_loader_parser
+from incremental import write_frame
+from metrics import log_event, tracked, enable_profiling
 
 def insert_team(name, imageurl, abbr, session=None):
+    session_created = False
     try:
         if session is None:
-            engine = get_db_connection()
-            # Crear la sesión
-            Session = sessionmaker(bind=engine)
-            session = Session()
+            session = get_db_session()
             session_created = True
-        else:
-            session_created = False
 
-        # Crear los metadatos y acceder a la tabla 'teams'
-        metadata = MetaData()
-        teams = Table('teams', metadata, autoload_with=session.bind)
+        # Acceder a la tabla 'teams' (definición en caché)
+        teams = get_table('teams')
 
         # Crear la inserción
         insert_query = teams.insert().values(name=name, imageurl=imageurl, abbreviation=abbr)
@@ -36,47 +23,47 @@ def insert_team(name, imageurl, abbr, session=None):
 
         if session_created:
             session.commit()
-            print(f"Equipo {name} insertado correctamente en la tabla 'teams'.")
-    except Exception as e:
-        print(f"Error al insertar el equipo {name}: {e}")
+            log_event('insert', table='teams', team=name)
+    except Exception:
         if session_created:
             session.rollback()
+        raise
     finally:
         if session_created:
             session.close()
 
-def insert_teams(teams_df):
+# Mapeo de columnas de 'teams': columna en la tabla -> (columna del DataFrame, tipo)
+TEAMS_COLUMNS = {
+    'id': ('id', 'int64'),
+    'name': ('name', None),
+    'imageurl': ('logo', None),
+    'abbreviation': ('abbreviation', None),
+}
+
+def insert_teams(teams_df, incremental=False):
+    session = get_db_session()
     try:
-        engine = get_db_connection()
-        # Crear la sesión
-        Session = sessionmaker(bind=engine)
-        session = Session()
-
-        # Crear los metadatos y acceder a la tabla 'teams'
-        metadata = MetaData()
-        teams_table = Table('teams', metadata, autoload_with=engine)
-
-        # Preparar una lista de diccionarios con los datos de los equipos
-        teams_data = []
-        for index, row in teams_df.iterrows():
-            id = row['id']
-            name = row['name']
-            imageurl = row['logo']
-            abbr = row['abbreviation']
-            teams_data.append({'id': id, 'name': name, 'imageurl': imageurl, 'abreviation': abbr})
+        # Acceder a la tabla 'teams' (definición en caché)
+        teams_table = get_table('teams')
+
+        # Preparar el DataFrame con las columnas de la tabla
+        teams_data = build_frame(teams_df, TEAMS_COLUMNS)
 
         # Ejecutar la inserción en bloque
-        session.execute(teams_table.insert(), teams_data)
+        rows = write_frame(session, teams_table, teams_data, incremental, loader='teams')
         session.commit()
-        print("Todos los equipos fueron insertados correctamente en la tabla 'teams'.")
-    except Exception as e:
-        print(f"Error al insertar los equipos: {e}")
+        return rows
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
 
 
-if __name__ == '__main__':
+def main(argv=None):
+    args = get_loader_parser("Carga de equipos").parse_args(argv or [])
+    enable_profiling(args.profile)
+
     nbaTeams = [
         {"id": 1, "name": "Atlanta Hawks", "logo": "https://upload.wikimedia.org/wikipedia/en/2/24/Atlanta_Hawks_logo.svg", "abbreviation": "ATL"},
         {"id": 2, "name": "Boston Celtics", "logo": "https://upload.wikimedia.org/wikipedia/en/thumb/8/8f/Boston_Celtics.svg/800px-Boston_Celtics.svg.png", "abbreviation": "BOS"},
@@ -114,4 +101,8 @@ if __name__ == '__main__':
     teams_df = pd.DataFrame(nbaTeams)
 
     # Insertar los equipos en la base de datos
-    insert_teams(teams_df)
+    tracked('teams', 'insert', insert_teams, teams_df, incremental=args.incremental)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,79 @@
+from sqlalchemy import delete, select
+from db_setup import get_db_connection
+from sources import get_file_hash
+from schema import load_manifest_table
+from metrics import log_event
+import datetime
+import os
+
+# Directorio de los archivos fuente (los loaders usan rutas relativas 'data/...')
+DATA_DIR = 'data'
+
+# Archivos fuente -> loaders que los leen
+INPUTS = {
+    'NBA_Player_Stats.csv': ['players', 'player_stats', 'mvps'],
+    'NBA_Player_IDs.csv': ['players'],
+    'NBA_Team_Stats.csv': ['team_stats'],
+    'NBA Finals and MVP.xlsx': ['nba_champions', 'conference_champions'],
+}
+
+# Archivos fuente de cada loader
+def get_loader_inputs(loader):
+    return [name for name, loaders in INPUTS.items() if loader in loaders]
+
+# Hash del contenido de cada archivo fuente (reutiliza el índice de la caché de parseo si no cambió el mtime)
+def compute_input_hashes(data_dir=DATA_DIR):
+    return {name: get_file_hash(os.path.join(data_dir, name)) for name in INPUTS}
+
+# Leer el manifiesto: loader -> {archivo: hash con el que se cargó}
+def read_manifest(engine=None):
+    engine = engine or get_db_connection()
+    load_manifest_table.create(engine, checkfirst=True)
+    manifest = {}
+    with engine.connect() as connection:
+        for loader, input_name, file_hash in connection.execute(
+            select(load_manifest_table.c.loader, load_manifest_table.c.input, load_manifest_table.c.hash)
+        ):
+            manifest.setdefault(loader, {})[input_name] = file_hash
+    return manifest
+
+# Registrar que los loaders terminaron de cargar con esos hashes (reemplaza su registro anterior)
+def record_loads(loaders, hashes, engine=None):
+    if not loaders:
+        return
+    engine = engine or get_db_connection()
+    load_manifest_table.create(engine, checkfirst=True)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = [
+        {'loader': loader, 'input': name, 'hash': hashes[name], 'loaded_at': now}
+        for loader in loaders
+        for name in get_loader_inputs(loader)
+    ]
+    rows += [
+        {'loader': loader, 'input': '', 'hash': '', 'loaded_at': now}
+        for loader in loaders
+        if not get_loader_inputs(loader)
+    ]
+    with engine.begin() as connection:
+        connection.execute(delete(load_manifest_table).where(load_manifest_table.c.loader.in_(list(loaders))))
+        connection.execute(load_manifest_table.insert(), rows)
+    log_event('manifest_recorded', loaders=list(loaders))
+
+# Calcular los loaders a ejecutar: los que nunca se cargaron, los que tienen algún archivo fuente
+# distinto al registrado y los que dependen de alguno de ellos. 'stages' es nombre -> (módulo, dependencias)
+def get_invalidated_loaders(stages, hashes, manifest):
+    invalidated = []
+    for name, (_, deps) in stages.items():
+        recorded = manifest.get(name)
+        changed = recorded is None or any(recorded.get(input_name) != hashes[input_name] for input_name in get_loader_inputs(name))
+        # Las etapas están en orden de dependencias: basta con mirar las ya marcadas
+        if changed or any(dep in invalidated for dep in deps):
+            invalidated.append(name)
+    return invalidated
+
+# Archivos fuente que cambiaron respecto del manifiesto (para informar el motivo de la sincronización)
+def get_changed_inputs(hashes, manifest):
+    return [
+        name for name in INPUTS
+        if any(manifest.get(loader, {}).get(name) != hashes[name] for loader in INPUTS[name])
+    ]
@@ -0,0 +1,166 @@
+from contextlib import contextmanager
+import cProfile
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import pandas as pd
+
+# Métricas y eventos de los loaders como logs JSON (una línea por evento) en stderr
+logger = logging.getLogger('nba')
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+# Directorio de los archivos de rechazos (filas que no se pudieron cargar, con el motivo)
+REJECTS_DIR = os.getenv('REJECTS_DIR', 'data/rejects')
+
+# Cantidad de líneas del reporte de asignaciones de memoria en modo profiling
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '25'))
+
+_lock = threading.Lock()
+
+# Directorio de salida del profiling (None = desactivado)
+_profile_dir = None
+
+# El tamaño máximo de memoria del proceso (ru_maxrss) no existe en Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        event = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname.lower(),
+            'event': record.getMessage(),
+        }
+        event.update(getattr(record, 'fields', {}))
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+# Configurar la salida de los logs (una sola vez por proceso)
+def configure_logging(level=None):
+    with _lock:
+        if not logger.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(JsonFormatter())
+            logger.addHandler(handler)
+            logger.propagate = False
+        logger.setLevel(level or LOG_LEVEL)
+
+# Registrar un evento con sus campos
+def log_event(event, level=logging.INFO, **fields):
+    if not logger.handlers:
+        configure_logging()
+    logger.log(level, event, extra={'fields': fields})
+
+# Memoria máxima del proceso en MB (en Linux ru_maxrss está en KB, en macOS en bytes)
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+# Medir una etapa de un loader: filas de entrada y salida, rechazos, tiempo, filas/seg y memoria máxima.
+# El bloque puede completar 'rows_out' y 'rejected' en el diccionario que recibe
+@contextmanager
+def track_stage(loader, stage, rows_in=None):
+    metrics = {'loader': loader, 'stage': stage, 'rows_in': rows_in, 'rows_out': None, 'rejected': None}
+    start = time.perf_counter()
+    try:
+        yield metrics
+    except Exception as e:
+        metrics.update(status='error', error=str(e))
+        raise
+    else:
+        metrics['status'] = 'ok'
+    finally:
+        elapsed = time.perf_counter() - start
+        rows = metrics['rows_out'] if metrics['rows_out'] is not None else rows_in
+        if metrics['rejected'] is None and rows_in is not None and metrics['rows_out'] is not None:
+            metrics['rejected'] = max(rows_in - metrics['rows_out'], 0)
+        # Una etapa que rechazó todas las filas no terminó bien aunque no haya lanzado una excepción
+        if metrics['status'] == 'ok' and rows_in and metrics['rejected'] == rows_in:
+            metrics['status'] = 'all_rejected'
+        metrics.update(
+            elapsed_s=round(elapsed, 4),
+            rows_per_sec=round(rows / elapsed, 1) if rows and elapsed > 0 else None,
+            peak_rss_mb=get_peak_rss_mb(),
+        )
+        level = {'error': logging.ERROR, 'all_rejected': logging.WARNING}.get(metrics['status'], logging.INFO)
+        log_event('stage', level=level, **metrics)
+
+# Activar el profiling de las etapas: cada una deja en 'directory' un .prof de cProfile
+# y un reporte con las líneas que más memoria asignaron (tracemalloc)
+def enable_profiling(directory):
+    global _profile_dir
+    _profile_dir = directory
+
+# Perfilar una etapa si el profiling está activado. tracemalloc es global al proceso,
+# así que las etapas perfiladas no deben ejecutarse en paralelo
+@contextmanager
+def profile_stage(loader, stage):
+    if _profile_dir is None:
+        yield
+        return
+
+    os.makedirs(_profile_dir, exist_ok=True)
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        base_path = os.path.join(_profile_dir, f"{loader}-{stage}")
+        profiler.dump_stats(f"{base_path}.prof")
+        with open(f"{base_path}-alloc.txt", 'w') as f:
+            f.write(f"Pico de memoria trazada: {traced_peak / 2**20:.2f} MB\n")
+            f.write(f"Top {PROFILE_TOP} líneas por memoria asignada (viva al final de la etapa):\n")
+            for stat in snapshot.statistics('lineno')[:PROFILE_TOP]:
+                f.write(f"{stat}\n")
+        log_event('profile', loader=loader, stage=stage, prof=f"{base_path}.prof",
+                  allocations=f"{base_path}-alloc.txt", traced_peak_mb=round(traced_peak / 2**20, 2))
+
+# Ejecutar una función como etapa medida: las filas de entrada son las del primer DataFrame
+# recibido y las de salida las del DataFrame devuelto (o la cantidad, si devuelve un entero)
+def tracked(loader, stage, func, *args, **kwargs):
+    rows_in = next((len(arg) for arg in args if isinstance(arg, pd.DataFrame)), None)
+    with track_stage(loader, stage, rows_in) as metrics, profile_stage(loader, stage):
+        result = func(*args, **kwargs)
+        if isinstance(result, pd.DataFrame):
+            metrics['rows_out'] = len(result)
+        elif isinstance(result, int):
+            metrics['rows_out'] = result
+    return result
+
+def get_rejects_path(loader):
+    return os.path.join(REJECTS_DIR, f"{loader}.csv")
+
+# Borrar los rechazos de una corrida anterior del loader
+def clear_rejects(loader):
+    try:
+        os.remove(get_rejects_path(loader))
+    except FileNotFoundError:
+        pass
+
+# Agregar en bloque las filas rechazadas al archivo del loader, con el motivo
+def write_rejects(loader, rows, reason, columns=None):
+    if len(rows) == 0:
+        return 0
+    rows = rows[columns] if columns is not None else rows
+    path = get_rejects_path(loader)
+    with _lock:
+        os.makedirs(REJECTS_DIR, exist_ok=True)
+        header = not os.path.exists(path)
+        rows.assign(reason=reason).to_csv(path, mode='a', header=header, index=False)
+    log_event('rejects', level=logging.WARNING, loader=loader, reason=reason, rows=len(rows), path=path)
+    return len(rows)
@@ -0,0 +1,200 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import importlib
+import argparse
+import logging
+import time
+import sys
+import os
+
+# Permitir los imports planos de los loaders (from db_setup import ...) al ejecutar con python -m src.pipeline
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import log_event, get_peak_rss_mb
+from async_writes import ASYNC_STAGES, WRITE_CONCURRENCY, async_stage_runner
+from schema import create_schema, bulk_load_mode, check_truncatable
+from manifest import compute_input_hashes, record_loads
+from export import export_tables
+from contextlib import nullcontext
+
+# Etapas del pipeline: nombre -> (módulo del loader, etapas de las que depende)
+STAGES = {
+    'teams': ('load_teams', []),
+    'players': ('load_players', []),
+    'team_stats': ('load_team_stats', ['teams']),
+    'nba_champions': ('load_nba_champions', ['teams']),
+    'conference_champions': ('load_conference_champions', ['teams']),
+    'player_stats': ('load_player_stats', ['players', 'teams']),
+    'mvps': ('load_MVPs', ['players']),
+}
+
+# Tablas que carga cada etapa (las que se vacían antes de una carga completa con --bulk-load)
+STAGE_TABLES = {
+    'teams': ['teams'],
+    'players': ['players', 'player_ids'],
+    'team_stats': ['teams_stats'],
+    'nba_champions': ['nba_champions'],
+    'conference_champions': ['conference_champions'],
+    'player_stats': ['players_stats'],
+    'mvps': ['mvp'],
+}
+
+# Calcular las etapas a ejecutar, incluyendo sus dependencias (salvo con with_dependencies=False,
+# cuando las dependencias ya están cargadas)
+def resolve_stages(selected=None, with_dependencies=True):
+    if not selected:
+        return list(STAGES)
+    resolved = []
+    pending = list(selected)
+    while pending:
+        name = pending.pop()
+        if name not in STAGES:
+            raise ValueError(f"Etapa desconocida: {name}")
+        if name not in resolved:
+            resolved.append(name)
+            if with_dependencies:
+                pending.extend(STAGES[name][1])
+    return [name for name in STAGES if name in resolved]
+
+# Ejecutar una etapa y devolver su tiempo de ejecución
+def run_stage(name, stage_args=None):
+    module_name, _ = STAGES[name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    module.main(stage_args or [])
+    return time.perf_counter() - start
+
+# Ejecutar las etapas respetando las dependencias, en paralelo cuando es posible
+# ('extra_args' agrega opciones propias de algunas etapas: nombre -> lista de argumentos).
+# Las etapas de 'async_stages' se programan con 'submit_async' (el event loop de las escrituras
+# asíncronas) en cuanto terminan sus dependencias, igual que las demás
+def run_pipeline(selected=None, workers=4, stage_args=None, extra_args=None, with_dependencies=True,
+                 async_stages=(), submit_async=None):
+    stages = resolve_stages(selected, with_dependencies)
+    timings = {}
+    failed = {}
+    done = set()
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while len(done) + len(failed) < len(stages):
+            # Lanzar las etapas cuyas dependencias ya terminaron
+            for name in stages:
+                if name in done or name in failed or name in running.values():
+                    continue
+                deps = [dep for dep in STAGES[name][1] if dep in stages]
+                if any(dep in failed for dep in deps):
+                    failed[name] = 'dependencia fallida'
+                    log_event('pipeline_stage_skipped', level=logging.WARNING, pipeline_stage=name, reason=failed[name])
+                elif all(dep in done for dep in deps) and name in async_stages:
+                    log_event('pipeline_stage_started', pipeline_stage=name, mode='async')
+                    running[submit_async(name)] = name
+                elif all(dep in done for dep in deps):
+                    log_event('pipeline_stage_started', pipeline_stage=name)
+                    args = (stage_args or []) + (extra_args or {}).get(name, [])
+                    running[executor.submit(run_stage, name, args)] = name
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                    done.add(name)
+                    log_event('pipeline_stage_finished', pipeline_stage=name, elapsed_s=round(timings[name], 4))
+                except Exception as e:
+                    failed[name] = str(e)
+                    log_event('pipeline_stage_failed', level=logging.ERROR, pipeline_stage=name, error=str(e))
+
+    total = time.perf_counter() - start
+    log_event(
+        'pipeline_finished',
+        level=logging.ERROR if failed else logging.INFO,
+        elapsed_s=round(total, 4),
+        timings={name: round(elapsed, 4) for name, elapsed in timings.items()},
+        failed=failed,
+        peak_rss_mb=get_peak_rss_mb(),
+    )
+    return timings, failed
+
+# Ejecutar las etapas con el pipeline de siempre o, con --async-writes, solapando las inserciones
+def run_stages(args, workers, stage_args, extra_args):
+    if not args.async_writes:
+        _, failed = run_pipeline(args.stages, workers=workers, stage_args=stage_args, extra_args=extra_args)
+        return failed
+
+    # Modo asíncrono: las etapas con opciones propias siguen en el pool de hilos; las demás que lo admiten
+    # preparan los datos en un hilo e insertan en el event loop, en cuanto terminan sus dependencias
+    stages = resolve_stages(args.stages)
+    async_stages = [name for name in stages if name in ASYNC_STAGES and name not in extra_args]
+    with async_stage_runner(args.incremental, args.memory_report, args.write_concurrency) as submit_async:
+        _, failed = run_pipeline(args.stages, workers=workers, stage_args=stage_args, extra_args=extra_args,
+                                 async_stages=async_stages, submit_async=submit_async)
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga completa de la base de datos de la NBA")
+    parser.add_argument('stages', nargs='*', help="Etapas a ejecutar (por defecto, todas)")
+    parser.add_argument('--workers', type=int, default=4, help="Cantidad de etapas en paralelo")
+    parser.add_argument('--incremental', action='store_true', help="Cargar cada tabla en forma incremental")
+    parser.add_argument('--memory-report', action='store_true', help="Mostrar la memoria de los DataFrames de cada etapa")
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                        help="Perfilar cada etapa de los loaders y guardar los reportes en DIR (ejecuta las etapas de a una)")
+    parser.add_argument('--async-writes', action='store_true',
+                        help="Insertar las tablas que dependen de equipos y jugadores en un solo event loop")
+    parser.add_argument('--write-concurrency', type=int, default=WRITE_CONCURRENCY,
+                        help="Inserciones asíncronas en curso al mismo tiempo")
+    parser.add_argument('--create-schema', action='store_true', help="Crear las tablas y los índices que falten antes de cargar")
+    parser.add_argument('--bulk-load', action='store_true',
+                        help="Carga completa: vacía las tablas de las etapas y carga sin índices secundarios ni claves foráneas (se recrean al terminar)")
+    parser.add_argument('--stats-parallel', type=int, metavar='WORKERS',
+                        help="Cargar las estadísticas de jugadores por temporada con WORKERS procesos")
+    parser.add_argument('--export', action='store_true',
+                        help="Al terminar, exportar las tablas a Parquet (solo las particiones que cambiaron)")
+    args = parser.parse_args(argv)
+
+    # Opciones que se reenvían a cada loader
+    stage_args = []
+    if args.incremental:
+        stage_args.append('--incremental')
+    if args.memory_report:
+        stage_args.append('--memory-report')
+
+    extra_args = {}
+    if args.stats_parallel:
+        extra_args['player_stats'] = ['--parallel', str(args.stats_parallel)]
+
+    # tracemalloc es global al proceso: con profiling las etapas no pueden correr en paralelo
+    workers = args.workers
+    if args.profile:
+        stage_args.extend(['--profile', args.profile])
+        workers = 1
+
+    if args.async_writes and args.profile:
+        parser.error("--async-writes no se puede combinar con --profile")
+    # La carga incremental busca por clave natural: necesita los índices
+    if args.bulk_load and args.incremental:
+        parser.error("--bulk-load no se puede combinar con --incremental")
+
+    if args.create_schema:
+        create_schema()
+    # Los hashes se toman antes de cargar: si un archivo cambia durante la carga, la próxima sincronización lo recarga
+    hashes = compute_input_hashes()
+    bulk_tables = [table for name in resolve_stages(args.stages) for table in STAGE_TABLES[name]]
+    if args.bulk_load:
+        try:
+            check_truncatable(bulk_tables)
+        except RuntimeError as e:
+            parser.error(str(e))
+    with bulk_load_mode(tables=bulk_tables) if args.bulk_load else nullcontext():
+        failed = run_stages(args, workers, stage_args, extra_args)
+    record_loads([name for name in resolve_stages(args.stages) if name not in failed], hashes)
+    if args.export and not failed:
+        export_tables(incremental=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
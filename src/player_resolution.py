@@ -0,0 +1,130 @@
+from difflib import SequenceMatcher
+from collections import Counter, defaultdict
+from utils import normalize_names
+from seasons import season_keys
+import numpy as np
+import pandas as pd
+
+# Sufijos que se ignoran al comparar nombres (Jr., III, ...)
+SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+# Similitud mínima para aceptar una coincidencia aproximada
+MIN_SCORE = 0.85
+
+# Diferencia máxima (en años) entre el año de nacimiento estimado y el del CSV de IDs
+BIRTH_YEAR_TOLERANCE = 1
+
+# Cantidad máxima de candidatos por n-gramas que se puntúan para cada nombre
+MAX_NGRAM_CANDIDATES = 20
+
+# Limpiar nombres para el matching (sin asteriscos de Hall of Fame y con las reglas comunes)
+def clean_names(series):
+    return normalize_names(series.astype(object).where(series.notna(), '').str.replace('*', '', regex=False))
+
+# Quitar los sufijos del final del nombre
+def strip_suffix(name):
+    tokens = name.split()
+    while len(tokens) > 1 and tokens[-1] in SUFFIXES:
+        tokens.pop()
+    return ' '.join(tokens)
+
+# Clave de bloqueo: apellido + inicial del nombre
+def blocking_key(name):
+    tokens = name.split()
+    if not tokens:
+        return None
+    return (tokens[-1], tokens[0][0])
+
+# N-gramas de caracteres del nombre (con relleno para marcar inicio y fin)
+def name_ngrams(name, n=3):
+    padded = f"  {name} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+# Año de nacimiento a partir de las fechas del CSV de IDs (formato M/D/AAAA)
+def parse_birth_years(series):
+    return pd.to_datetime(series, format='%m/%d/%Y', errors='coerce').dt.year
+
+# Estimar el año de nacimiento de cada jugador a partir de la temporada y la edad del CSV de estadísticas
+def estimate_birth_years(stats_df):
+    birth_years = season_keys(stats_df['Season']).astype(float) - pd.to_numeric(stats_df['Age'], errors='coerce')
+    return birth_years.groupby(stats_df['Player']).median()
+
+# Construir el índice de búsqueda sobre el CSV de IDs
+def build_player_index(ids_df):
+    ids_df = ids_df[ids_df['NBAID'].notna()].reset_index(drop=True)
+    birth_years = parse_birth_years(ids_df['BBRefBirthDate']).fillna(parse_birth_years(ids_df['NBABirthDate']))
+
+    index = {
+        'nba_id': ids_df['NBAID'].astype('int64').to_numpy(),
+        'birth_year': birth_years.to_numpy(dtype=float),
+        'names': defaultdict(set),
+        'exact': defaultdict(set),
+        'base': defaultdict(set),
+        'blocks': defaultdict(set),
+        'ngrams': defaultdict(set),
+    }
+    # Cada fila se indexa con todas sus variantes de nombre (BBRef y NBA)
+    for column in ('BBRefName', 'NBAName'):
+        for row, name in enumerate(clean_names(ids_df[column])):
+            if not name:
+                continue
+            base = strip_suffix(name)
+            index['names'][row].add(base)
+            index['exact'][name].add(row)
+            index['base'][base].add(row)
+            index['blocks'][blocking_key(base)].add(row)
+            for gram in name_ngrams(base):
+                index['ngrams'][gram].add(row)
+    return index
+
+# Elegir el NBAID entre las filas candidatas: se descartan las que tienen un año de nacimiento
+# incompatible con el estimado y solo se acepta el resultado si queda un único NBAID
+def pick_candidate(index, rows, birth_year):
+    rows = list(rows)
+    # Sin año de nacimiento estimado (NaN o -1) no se puede desempatar
+    if birth_year is not None and not np.isnan(birth_year) and birth_year >= 0:
+        years = index['birth_year'][rows]
+        rows = [row for row, year in zip(rows, years)
+                if np.isnan(year) or abs(year - birth_year) <= BIRTH_YEAR_TOLERANCE]
+    ids = set(index['nba_id'][rows])
+    return ids.pop() if len(ids) == 1 else None
+
+# Buscar coincidencias aproximadas usando solo los candidatos del bloque y de los n-gramas compartidos
+def fuzzy_candidates(index, base):
+    candidates = set(index['blocks'].get(blocking_key(base), ()))
+    grams = name_ngrams(base)
+    counts = Counter(row for gram in grams for row in index['ngrams'].get(gram, ()))
+    candidates.update(row for row, shared in counts.most_common(MAX_NGRAM_CANDIDATES) if shared * 2 >= len(grams))
+
+    best_score, best_rows = 0, []
+    for row in candidates:
+        score = max(SequenceMatcher(None, base, name).ratio() for name in index['names'][row])
+        if score > best_score + 1e-9:
+            best_score, best_rows = score, [row]
+        elif abs(score - best_score) <= 1e-9:
+            best_rows.append(row)
+    return best_rows if best_score >= MIN_SCORE else []
+
+# Resolver el NBAID de un nombre: coincidencia exacta, luego sin sufijos y por último aproximada
+def resolve_player(index, name, birth_year=None):
+    if not name:
+        return None
+    for rows in (index['exact'].get(name), index['base'].get(strip_suffix(name))):
+        if rows:
+            return pick_candidate(index, rows, birth_year)
+    rows = fuzzy_candidates(index, strip_suffix(name))
+    return pick_candidate(index, rows, birth_year) if rows else None
+
+# Resolver los NBAID de una columna de nombres (se resuelve una vez por nombre único)
+def resolve_players(index, names, birth_years=None):
+    cleaned = clean_names(names)
+    if birth_years is None:
+        birth_years = pd.Series(np.nan, index=names.index)
+    keys = pd.DataFrame({'name': cleaned, 'birth_year': birth_years.to_numpy(dtype=float)}).fillna({'birth_year': -1})
+    unique_keys = keys.drop_duplicates()
+    resolved = {
+        (name, birth_year): resolve_player(index, name, birth_year)
+        for name, birth_year in zip(unique_keys['name'], unique_keys['birth_year'])
+    }
+    nba_ids = [resolved[key] for key in zip(keys['name'], keys['birth_year'])]
+    return pd.Series(nba_ids, index=names.index, dtype='Int64')
@@ -0,0 +1,297 @@
+from contextlib import contextmanager
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, SmallInteger, String, Table, delete, inspect, select
+from sqlalchemy.schema import AddConstraint
+from db_setup import get_db_connection, dispose_engine
+from incremental import HASH_COLUMN
+from metrics import log_event
+import argparse
+import sys
+
+# Nombres fijos para los índices y las claves foráneas que crea este módulo. Los que ya existen se reconocen
+# por sus columnas (ver 'get_existing_indexes'), porque las bases creadas a mano los tienen con otros nombres
+NAMING_CONVENTION = {
+    'ix': 'ix_%(table_name)s_%(column_0_N_name)s',
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+metadata = MetaData(naming_convention=NAMING_CONVENTION)
+
+# Columnas numéricas de las estadísticas de jugadores y equipos
+PLAYERS_STATS_VALUES = [
+    'games', 'games_started', 'minutes_played', 'fg', 'fga', 'fg_percentage', 'three_points', 'three_pa',
+    'three_p_percentage', 'two_points', 'two_pa', 'two_p_percentage', 'efg_percentage', 'ft', 'fta',
+    'ft_percentage', 'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pts',
+]
+TEAMS_STATS_VALUES = [
+    'games', 'fg', 'fga', 'fg_percentage', 'three_points', 'three_pa', 'three_p_percentage', 'ft', 'fta',
+    'ft_percentage', 'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pts', 'eff', 'deff',
+]
+
+teams_table = Table(
+    'teams', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String),
+    Column('imageurl', String),
+    Column('abbreviation', String),
+    Column(HASH_COLUMN, BigInteger),
+    Index(None, 'name'),
+)
+
+players_table = Table(
+    'players', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String),
+    Column('position', String),
+    Column('nba_id', Integer),
+    Column(HASH_COLUMN, BigInteger),
+    Index(None, 'name'),
+    Index(None, 'nba_id'),
+)
+
+# Las temporadas se guardan como el año en que terminan (ver 'seasons.season_keys')
+players_stats_table = Table(
+    'players_stats', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('id_player', Integer, ForeignKey('players.id')),
+    Column('year', SmallInteger),
+    Column('team', String),
+    *[Column(name, Float) for name in PLAYERS_STATS_VALUES],
+    Column('season', SmallInteger),
+    Column(HASH_COLUMN, BigInteger),
+    # Equipo resuelto a partir de la abreviatura y la temporada (nulo en las filas 'TOT')
+    Column('idteam', Integer, ForeignKey('teams.id')),
+    Index(None, 'id_player', 'season'),
+    Index(None, 'season'),
+    Index(None, 'idteam'),
+)
+
+teams_stats_table = Table(
+    'teams_stats', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('idteam', Integer, ForeignKey('teams.id')),
+    Column('year', SmallInteger),
+    *[Column(name, Float) for name in TEAMS_STATS_VALUES],
+    Column(HASH_COLUMN, BigInteger),
+    Index(None, 'idteam', 'year'),
+)
+
+mvp_table = Table(
+    'mvp', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('idplayer', Integer, ForeignKey('players.id')),
+    Column('year', SmallInteger),
+    Column(HASH_COLUMN, BigInteger),
+    Index(None, 'idplayer'),
+)
+
+nba_champions_table = Table(
+    'nba_champions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('idteam', Integer, ForeignKey('teams.id')),
+    Column('year', SmallInteger),
+    Column(HASH_COLUMN, BigInteger),
+    Index(None, 'idteam'),
+)
+
+conference_champions_table = Table(
+    'conference_champions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('idteam', Integer, ForeignKey('teams.id')),
+    Column('year', SmallInteger),
+    Column('conference', String),
+    Column(HASH_COLUMN, BigInteger),
+    Index(None, 'idteam'),
+)
+
+# Tabla de equivalencias entre el id interno del jugador y los ids/nombres de cada fuente
+player_ids_table = Table(
+    'player_ids', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('id_player', Integer, nullable=False, index=True),
+    Column('name_norm', String, index=True),
+    Column('bbref_id', String, index=True),
+    Column('nba_id', Integer, index=True),
+    Column('espn_id', Integer, index=True),
+    Column('spotrac_id', Integer, index=True),
+)
+
+# Manifiesto de cargas: hash del contenido de cada archivo fuente con el que se cargó cada loader
+# (los loaders sin archivos fuente se registran con input = '' para saber que ya se cargaron)
+load_manifest_table = Table(
+    'load_manifest', metadata,
+    Column('loader', String, primary_key=True),
+    Column('input', String, primary_key=True),
+    Column('hash', String(64), nullable=False),
+    Column('loaded_at', DateTime(timezone=True), nullable=False),
+)
+
+# Agregar a las tablas existentes las columnas declaradas que les falten (bases creadas con un esquema anterior).
+# Devuelve las columnas agregadas como 'tabla.columna'
+def add_missing_columns(engine=None):
+    engine = engine or get_db_connection()
+    added = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        preparer = connection.dialect.identifier_preparer
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=connection.dialect)
+                    connection.exec_driver_sql(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.quote(column.name)} {column_type}"
+                    )
+                    added.append(f"{table.name}.{column.name}")
+    if added:
+        log_event('columns_added', columns=added)
+    return added
+
+# Índices de la tabla en la base: columnas -> nombre (el mismo índice puede tener cualquier nombre)
+def get_existing_indexes(inspector, table):
+    return {tuple(index['column_names']): index['name'] for index in inspector.get_indexes(table.name)}
+
+# Claves foráneas de la tabla en la base: (columnas, tabla referenciada) -> nombre
+def get_existing_foreign_keys(inspector, table):
+    return {
+        (tuple(fk['constrained_columns']), fk['referred_table']): fk['name']
+        for fk in inspector.get_foreign_keys(table.name)
+    }
+
+def get_index_columns(index):
+    return tuple(column.name for column in index.columns)
+
+def get_foreign_key_columns(constraint):
+    return (tuple(constraint.column_keys), constraint.referred_table.name)
+
+# Crear las tablas (con sus claves, índices y claves foráneas) que todavía no existen y completar
+# las existentes con las columnas, índices y claves foráneas que les falten
+def create_schema(engine=None):
+    engine = engine or get_db_connection()
+    metadata.create_all(engine, checkfirst=True)
+    if add_missing_columns(engine):
+        rebuild_secondary_indexes(engine)
+
+# Borrar los índices secundarios declarados y, en PostgreSQL, las claves foráneas (SQLite no las
+# controla salvo con PRAGMA foreign_keys y no permite borrarlas), con el nombre que tengan en la base.
+# Devuelve las claves foráneas declaradas que se borraron
+def drop_secondary_indexes(engine=None):
+    engine = engine or get_db_connection()
+    dropped_fks = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        preparer = connection.dialect.identifier_preparer
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = get_existing_indexes(inspector, table)
+            for index in table.indexes:
+                name = existing.get(get_index_columns(index))
+                if name is not None:
+                    connection.exec_driver_sql(f"DROP INDEX {preparer.quote(name)}")
+            if connection.dialect.name == 'postgresql':
+                existing_fks = get_existing_foreign_keys(inspector, table)
+                for constraint in table.foreign_key_constraints:
+                    name = existing_fks.get(get_foreign_key_columns(constraint))
+                    if name is not None:
+                        connection.exec_driver_sql(
+                            f"ALTER TABLE {preparer.format_table(table)} DROP CONSTRAINT {preparer.quote(name)}"
+                        )
+                        dropped_fks.append(constraint)
+    log_event('indexes_dropped', foreign_keys=[constraint.name for constraint in dropped_fks])
+    return dropped_fks
+
+# Recrear los índices declarados que falten y las claves foráneas (las indicadas o, si no se indican,
+# todas las declaradas que falten en PostgreSQL) y actualizar las estadísticas del planificador
+def rebuild_secondary_indexes(engine=None, foreign_keys=None):
+    engine = engine or get_db_connection()
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = [table for table in metadata.sorted_tables if inspector.has_table(table.name)]
+        if foreign_keys is None:
+            foreign_keys = []
+            if connection.dialect.name == 'postgresql':
+                for table in tables:
+                    existing_fks = get_existing_foreign_keys(inspector, table)
+                    foreign_keys.extend(
+                        fk for fk in table.foreign_key_constraints if get_foreign_key_columns(fk) not in existing_fks
+                    )
+        for table in tables:
+            existing = get_existing_indexes(inspector, table)
+            for index in table.indexes:
+                if get_index_columns(index) not in existing:
+                    index.create(connection)
+        for constraint in foreign_keys:
+            connection.execute(AddConstraint(constraint))
+        connection.exec_driver_sql('ANALYZE')
+    log_event('indexes_rebuilt', foreign_keys=[constraint.name for constraint in foreign_keys])
+
+# Verificar que se puedan vaciar las tablas: ninguna otra tabla con filas puede referenciarlas
+# (quedaría apuntando a filas borradas; hay que recargarla también)
+def check_truncatable(names, engine=None):
+    engine = engine or get_db_connection()
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        for table in metadata.sorted_tables:
+            if table.name in names or not inspector.has_table(table.name):
+                continue
+            referenced = sorted({fk.column.table.name for fk in table.foreign_keys} & set(names))
+            if referenced and connection.execute(select(table.c.id).limit(1)).first() is not None:
+                raise RuntimeError(
+                    f"No se puede vaciar {', '.join(referenced)}: '{table.name}' tiene filas que las referencian (recargarla también)"
+                )
+
+# Vaciar las tablas para una carga completa (en PostgreSQL con TRUNCATE, que las vacía juntas;
+# en SQLite con DELETE, de las que referencian hacia las referenciadas)
+def truncate_tables(names, engine=None):
+    engine = engine or get_db_connection()
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = [table for table in metadata.sorted_tables if table.name in names and inspector.has_table(table.name)]
+        if not tables:
+            return
+        if connection.dialect.name == 'postgresql':
+            preparer = connection.dialect.identifier_preparer
+            connection.exec_driver_sql(f"TRUNCATE {', '.join(preparer.format_table(table) for table in tables)}")
+        else:
+            for table in reversed(tables):
+                connection.execute(delete(table))
+    log_event('tables_truncated', tables=[table.name for table in tables])
+
+# Modo de carga masiva: las tablas indicadas se vacían (es una carga completa, no se agregan filas
+# a las existentes) y no hay índices secundarios ni claves foráneas durante la carga; se recrean al
+# final aunque la carga falle
+@contextmanager
+def bulk_load_mode(engine=None, tables=None):
+    engine = engine or get_db_connection()
+    tables = list(tables or [])
+    check_truncatable(tables, engine)
+    foreign_keys = drop_secondary_indexes(engine)
+    try:
+        truncate_tables(tables, engine)
+        yield
+    finally:
+        rebuild_secondary_indexes(engine, foreign_keys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Esquema de la base de datos de la NBA")
+    parser.add_argument('--create', action='store_true', help="Crear las tablas y los índices que falten")
+    parser.add_argument('--drop-indexes', action='store_true', help="Borrar los índices secundarios y las claves foráneas")
+    parser.add_argument('--rebuild-indexes', action='store_true', help="Recrear los índices secundarios")
+    args = parser.parse_args(argv)
+    if not (args.create or args.drop_indexes or args.rebuild_indexes):
+        parser.error("Indicar --create, --drop-indexes o --rebuild-indexes")
+
+    if args.create:
+        create_schema()
+    if args.drop_indexes:
+        drop_secondary_indexes()
+    if args.rebuild_indexes:
+        rebuild_secondary_indexes()
+    dispose_engine()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
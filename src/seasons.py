@@ -0,0 +1,82 @@
+from sqlalchemy import Integer, MetaData, Table, bindparam, inspect, select
+from db_setup import get_db_connection, dispose_engine
+from metrics import log_event
+import argparse
+import pandas as pd
+import sys
+
+# Formatos de temporada en las fuentes: '1997-98' (jugadores), '1997-1998' (equipos) y 1998 (Excel)
+SEASON_PATTERN = r'^\s*(\d{4})(?:\s*-\s*(\d{2}|\d{4}))?\s*$'
+
+# Columnas de temporada en cada tabla
+SEASON_COLUMNS = {
+    'players_stats': ['year', 'season'],
+    'teams_stats': ['year'],
+    'mvp': ['year'],
+    'nba_champions': ['year'],
+    'conference_champions': ['year'],
+}
+
+# Convertir una columna de temporadas a la clave entera canónica: el año en que termina la temporada
+# ('1997-98' -> 1998, '1997-1998' -> 1998, 1998 -> 1998). Los valores no reconocidos quedan como NA.
+def season_keys(values):
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('Int64')
+    # En columnas categóricas se convierte una vez cada categoría
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        keys = pd.array(season_keys(pd.Series(values.cat.categories, dtype=object)), dtype='Int64')
+        return pd.Series(keys.take(values.cat.codes.to_numpy(), allow_fill=True), index=values.index)
+    parts = values.astype(str).str.extract(SEASON_PATTERN)
+    start = pd.to_numeric(parts[0], errors='coerce')
+    keys = start.where(parts[1].isna(), start + 1)
+    return keys.astype('Int64')
+
+# Migrar las filas ya cargadas al formato de clave entera (y, en PostgreSQL, el tipo de la columna)
+def migrate_season_columns(engine=None):
+    engine = engine or get_db_connection()
+    metadata = MetaData()
+    with engine.begin() as connection:
+        preparer = connection.dialect.identifier_preparer
+        inspector = inspect(connection)
+        for table_name, columns in SEASON_COLUMNS.items():
+            # Las tablas de los loaders que todavía no se ejecutaron no existen: no hay nada que migrar
+            if not inspector.has_table(table_name):
+                log_event('seasons_migration_skipped', table=table_name, reason='tabla inexistente')
+                continue
+            table = Table(table_name, metadata, autoload_with=connection)
+            for column in columns:
+                # Solo hay un puñado de temporadas distintas: se actualiza una vez por valor
+                values = pd.Series([row[0] for row in connection.execute(select(table.c[column]).distinct())])
+                keys = season_keys(values)
+                updates = [
+                    {'old': old, 'new': int(new)}
+                    for old, new in zip(values, keys)
+                    if pd.notna(new) and str(old) != str(new)
+                ]
+                if updates:
+                    statement = table.update().where(table.c[column] == bindparam('old')).values({column: bindparam('new')})
+                    connection.execute(statement, updates)
+                log_event('seasons_migrated', table=table_name, column=column, values=len(updates))
+
+                # SQLite no permite cambiar el tipo de una columna; en PostgreSQL se pasa a SMALLINT
+                if connection.dialect.name == 'postgresql' and not isinstance(table.c[column].type, Integer):
+                    quoted = preparer.quote(column)
+                    connection.exec_driver_sql(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ALTER COLUMN {quoted} TYPE SMALLINT USING {quoted}::smallint"
+                    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrar las temporadas cargadas a la clave entera")
+    parser.add_argument('--migrate', action='store_true', help="Migrar las columnas de temporada de todas las tablas")
+    args = parser.parse_args(argv)
+    if not args.migrate:
+        parser.error("Indicar --migrate")
+    migrate_season_columns()
+    dispose_engine()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,236 @@
+from utils import normalize_names
+from seasons import season_keys
+import threading
+import hashlib
+import csv
+import json
+import os
+import pandas as pd
+
+# Caché de archivos fuente ya parseados (Parquet), invalidada por hash de contenido y versión del parser
+CACHE_DIR = os.getenv('PARSE_CACHE_DIR', 'data/.cache')
+CACHE_ENABLED = os.getenv('PARSE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+
+# Índice ruta -> (mtime, tamaño, hash) para no recalcular el hash de archivos que no cambiaron
+INDEX_FILE = 'index.json'
+
+_lock = threading.Lock()
+
+# El formato Parquet requiere pyarrow; sin él se parsea siempre desde el archivo original
+try:
+    import pyarrow
+    import pyarrow.compute as pc
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pyarrow = None
+    PARQUET_AVAILABLE = False
+
+# Calcular el hash del contenido de un archivo
+def compute_file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_index():
+    try:
+        with open(os.path.join(CACHE_DIR, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_index(index):
+    path = os.path.join(CACHE_DIR, INDEX_FILE)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, path)
+
+# Obtener el hash de un archivo, reutilizando el del índice si no cambió el mtime ni el tamaño
+def get_file_hash(path):
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    with _lock:
+        index = _read_index()
+        entry = index.get(key)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry['hash']
+        file_hash = compute_file_hash(path)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        index[key] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': file_hash}
+        _write_index(index)
+        return file_hash
+
+# Leer un archivo fuente usando la caché: si existe una versión parseada con el mismo
+# contenido y versión del parser se lee el Parquet, si no se parsea y se guarda.
+# 'columns' proyecta las columnas del resultado; sin caché se pasan al parser para que
+# lea solo las columnas de origen necesarias ('usecols').
+def cached_read(path, name, parser, version, columns=None, derived=None):
+    if not (CACHE_ENABLED and PARQUET_AVAILABLE):
+        df = parser(path, source_columns(columns, derived or {}))
+        return df if columns is None else df[columns]
+
+    cache_path = os.path.join(CACHE_DIR, f"{name}-v{version}-{get_file_hash(path)[:16]}.parquet")
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path, columns=columns)
+
+    # La caché guarda siempre el archivo completo para que sirva a todos los loaders
+    df = parser(path, None)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_path)
+    return df if columns is None else df[columns]
+
+# Columnas de origen necesarias para obtener 'columns' (las derivadas se reemplazan por su columna de origen)
+def source_columns(columns, derived):
+    if columns is None:
+        return None
+    return list(dict.fromkeys(derived.get(column, column) for column in columns))
+
+# Tipos por fuente: categorías para textos con pocos valores distintos, float32/Int16 para estadísticas
+PLAYER_STATS_DTYPES = {
+    'Rk': 'Int16', 'Player': 'str', 'Pos': 'category', 'Age': 'Int16', 'Tm': 'category',
+    'G': 'Int16', 'GS': 'Int16', 'Season': 'category', 'MVP': 'bool',
+    **{column: 'float32' for column in [
+        'MP', 'FG', 'FGA', 'FG%', '3P', '3PA', '3P%', '2P', '2PA', '2P%', 'eFG%', 'FT', 'FTA', 'FT%',
+        'ORB', 'DRB', 'TRB', 'AST', 'STL', 'BLK', 'TOV', 'PF', 'PTS',
+    ]},
+}
+
+# Encabezado de NBA_Team_Stats.csv y nombre que se le asigna a cada columna (los tres 'Pct' repetidos
+# pasan a ser el porcentaje de su columna convertidos-intentados)
+TEAM_STATS_HEADER = [
+    'No', 'Team', 'G', 'Min', 'Pts', 'Reb', 'Ast', 'Stl', 'Blk', 'To', 'Pf', 'Dreb', 'Oreb',
+    'Fgm-a', 'Pct', '3gm-a', 'Pct', 'Ftm-a', 'Pct', 'Eff', 'Deff', 'Year',
+]
+TEAM_STATS_NAMES = [
+    'No', 'Team', 'G', 'Min', 'Pts', 'Reb', 'Ast', 'Stl', 'Blk', 'To', 'Pf', 'Dreb', 'Oreb',
+    'Fgm-a', 'Fg%', '3gm-a', '3P%', 'Ftm-a', 'Ft%', 'Eff', 'Deff', 'Year',
+]
+
+# Con pyarrow las columnas convertidos-intentados se leen como texto de Arrow: la unión y la expresión
+# regular se evalúan en C++ (RE2) en lugar de fila por fila en Python
+COMPOSITE_DTYPE = pd.ArrowDtype(pyarrow.string()) if pyarrow is not None else 'str'
+
+# Las columnas de texto se leen como texto para detectar los encabezados repetidos; las numéricas toman
+# como nulo el texto de su encabezado, así que esas filas no impiden leerlas con su tipo. Los enteros
+# se leen como float32 (el parser de C no convierte directo a Int16) y se convierten después
+TEAM_STATS_DTYPES = {
+    'Team': 'str', 'Year': 'str',
+    'Fgm-a': COMPOSITE_DTYPE, '3gm-a': COMPOSITE_DTYPE, 'Ftm-a': COMPOSITE_DTYPE,
+    **{column: 'float32' for column in [
+        'No', 'G', 'Min', 'Pts', 'Reb', 'Ast', 'Stl', 'Blk', 'To', 'Pf', 'Dreb', 'Oreb', 'Fg%', '3P%', 'Ft%', 'Eff', 'Deff',
+    ]},
+}
+TEAM_STATS_INTEGERS = ['No', 'G']
+
+# Columnas convertidos-intentados -> (convertidos, intentados)
+TEAM_STATS_COMPOSITE = {
+    'Fgm-a': ('Fgm', 'Fga'),
+    '3gm-a': ('3pm', '3pa'),
+    'Ftm-a': ('Ftm', 'Fta'),
+}
+
+# Las tres columnas unidas con '|' se separan con una sola expresión regular (los grupos tienen
+# nombre porque la extracción de Arrow lo exige)
+_MADE_ATTEMPTED = r'\s*(?P<made{0}>\d+(?:\.\d*)?)\s*-\s*(?P<attempted{0}>\d+(?:\.\d*)?)\s*'
+TEAM_STATS_COMPOSITE_PATTERN = '^' + r'\|'.join(_MADE_ATTEMPTED.format(i) for i in range(len(TEAM_STATS_COMPOSITE))) + '$'
+
+PLAYER_IDS_DTYPES = {
+    'NBAID': 'Int64', 'ESPNID': 'Int64', 'SpotracID': 'Int64',
+}
+
+FINALS_DTYPES = {
+    'Year': 'int16', 'Western Champion': 'category', 'Eastern Champion': 'category',
+    'NBA Champion': 'category', 'NBA Vice-Champion': 'category',
+}
+
+# Columnas derivadas que agrega cada parser -> columna de origen
+PLAYER_STATS_DERIVED = {'Player_norm': 'Player', 'season_key': 'Season'}
+SEASON_DERIVED = {'season_key': 'Year'}
+TEAM_STATS_DERIVED = {
+    **SEASON_DERIVED,
+    **{part: source for source, parts in TEAM_STATS_COMPOSITE.items() for part in parts},
+}
+
+def _parse_player_stats(path, usecols=None):
+    df = pd.read_csv(path, usecols=usecols, dtype=PLAYER_STATS_DTYPES)
+    if 'Player' in df:
+        df['Player_norm'] = normalize_names(df['Player'])
+    if 'Season' in df:
+        df['season_key'] = season_keys(df['Season']).astype('Int16')
+    return df
+
+def _parse_player_ids(path, usecols=None):
+    return pd.read_csv(path, delimiter=',', encoding='ISO-8859-1', usecols=usecols, dtype=PLAYER_IDS_DTYPES)
+
+# Verificar que el encabezado sea el esperado antes de asignar los nombres por posición
+def _check_team_stats_header(path):
+    with open(path, newline='') as f:
+        header = next(csv.reader(f), [])
+    if [column.strip() for column in header] != TEAM_STATS_HEADER:
+        raise ValueError(f"Encabezado inesperado en {path}: {header}")
+
+# Filas que repiten el encabezado (la exportación puede intercalarlas en cualquier lugar del archivo)
+def _team_stats_header_rows(df):
+    return df['Team'].str.strip().eq('Team') & df['Year'].str.strip().eq('Year')
+
+# Separar las columnas convertidos-intentados en una sola pasada: se unen las tres y la expresión
+# regular devuelve las seis columnas, que se convierten juntas a float32
+def _split_made_attempted(df):
+    sources = list(TEAM_STATS_COMPOSITE)
+    names = [part for column in sources for part in TEAM_STATS_COMPOSITE[column]]
+    if pyarrow is None:
+        joined = df[sources[0]].str.cat([df[column] for column in sources[1:]], sep='|')
+        parts = joined.str.extract(TEAM_STATS_COMPOSITE_PATTERN).astype('float32')
+        parts.columns = names
+        return parts
+
+    # Las filas que no respetan el formato quedan nulas (NaN) en las seis columnas
+    joined = pc.binary_join_element_wise(*[pyarrow.array(df[column].array) for column in sources], '|')
+    fields = pc.extract_regex(joined, TEAM_STATS_COMPOSITE_PATTERN).flatten()
+    return pd.DataFrame(
+        {name: pc.cast(field, pyarrow.float32()).to_numpy(zero_copy_only=False) for name, field in zip(names, fields)},
+        index=df.index,
+    )
+
+def _parse_team_stats(path, usecols=None):
+    # Se lee el archivo completo: la detección de encabezados y la separación de las columnas
+    # compuestas necesitan 'Team', 'Year' y las tres columnas convertidos-intentados
+    _check_team_stats_header(path)
+    na_values = {
+        name: [header] for name, header in zip(TEAM_STATS_NAMES, TEAM_STATS_HEADER) if name not in ('Team', 'Year')
+    }
+    df = pd.read_csv(path, header=0, names=TEAM_STATS_NAMES, dtype=TEAM_STATS_DTYPES, na_values=na_values)
+    df = df[~_team_stats_header_rows(df)].reset_index(drop=True)
+
+    parts = _split_made_attempted(df)
+    df = pd.concat([df.drop(columns=list(TEAM_STATS_COMPOSITE)), parts], axis=1)
+    df[TEAM_STATS_INTEGERS] = df[TEAM_STATS_INTEGERS].astype('Int16')
+    df['Team'] = df['Team'].astype('category')
+    df['Year'] = df['Year'].astype('category')
+    df['season_key'] = season_keys(df['Year']).astype('Int16')
+    return df
+
+def _parse_finals_excel(path, usecols=None):
+    df = pd.read_excel(path, engine='openpyxl', usecols=usecols, dtype=FINALS_DTYPES)
+    if 'Year' in df:
+        df['season_key'] = season_keys(df['Year']).astype('Int16')
+    return df
+
+# Estadísticas de jugadores por temporada (NBA_Player_Stats.csv), con el nombre normalizado y la clave de temporada
+def read_player_stats(path, columns=None):
+    return cached_read(path, 'player_stats', _parse_player_stats, version=3, columns=columns, derived=PLAYER_STATS_DERIVED)
+
+# IDs de jugadores en cada fuente (NBA_Player_IDs.csv)
+def read_player_ids(path, columns=None):
+    return cached_read(path, 'player_ids', _parse_player_ids, version=2, columns=columns)
+
+# Estadísticas de equipos por temporada (NBA_Team_Stats.csv)
+def read_team_stats(path, columns=None):
+    return cached_read(path, 'team_stats', _parse_team_stats, version=4, columns=columns, derived=TEAM_STATS_DERIVED)
+
+# Finales y MVPs (NBA Finals and MVP.xlsx)
+def read_finals_excel(path, columns=None):
+    return cached_read(path, 'finals', _parse_finals_excel, version=3, columns=columns, derived=SEASON_DERIVED)
@@ -0,0 +1,93 @@
+import argparse
+import logging
+import time
+import sys
+import os
+
+# Permitir los imports planos de los loaders (from db_setup import ...) al ejecutar con python -m src.sync
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline import STAGES, run_pipeline
+from manifest import DATA_DIR, compute_input_hashes, read_manifest, record_loads, get_invalidated_loaders, get_changed_inputs
+from export import export_tables
+from metrics import log_event
+
+# Intervalo en segundos entre revisiones del directorio de datos en modo watch
+POLL_INTERVAL = float(os.getenv('SYNC_POLL_INTERVAL', '30'))
+
+# Sincronizar una vez: ejecutar (en forma incremental y en orden de dependencias) solo los loaders
+# invalidados por archivos fuente que cambiaron desde su última carga (con 'export', exportar después
+# las particiones que cambiaron). Devuelve los que fallaron
+def sync_once(workers=4, stage_args=None, dry_run=False, data_dir=DATA_DIR, export=False):
+    hashes = compute_input_hashes(data_dir)
+    manifest = read_manifest()
+    loaders = get_invalidated_loaders(STAGES, hashes, manifest)
+    if not loaders:
+        log_event('sync_up_to_date')
+        return {}
+
+    log_event('sync_started', loaders=loaders, changed_inputs=get_changed_inputs(hashes, manifest), dry_run=dry_run)
+    if dry_run:
+        return {}
+
+    # Las dependencias que no cambiaron ya están cargadas: no se vuelven a ejecutar
+    args = ['--incremental'] + (stage_args or [])
+    _, failed = run_pipeline(loaders, workers=workers, stage_args=args, with_dependencies=False)
+    record_loads([name for name in loaders if name not in failed], hashes)
+    if export and not failed:
+        export_tables(incremental=True)
+    return failed
+
+# Revisar el directorio de datos cada 'interval' segundos y sincronizar cuando cambia algún archivo
+def watch(interval=None, workers=4, stage_args=None, data_dir=DATA_DIR, export=False):
+    interval = interval or POLL_INTERVAL
+    log_event('sync_watch_started', data_dir=data_dir, interval_s=interval)
+    last_hashes = None
+    try:
+        while True:
+            try:
+                # Mientras los archivos no cambien el hash sale del índice (mtime y tamaño), sin consultar la base
+                hashes = compute_input_hashes(data_dir)
+                if hashes != last_hashes:
+                    failed = sync_once(workers, stage_args, data_dir=data_dir, export=export)
+                    # Si algo falló se reintenta en la próxima revisión
+                    last_hashes = None if failed else hashes
+            except OSError as e:
+                # Un archivo que se está reemplazando puede no existir por un momento
+                log_event('sync_watch_error', level=logging.WARNING, error=str(e))
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        log_event('sync_watch_stopped')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recargar solo las tablas cuyos archivos fuente cambiaron")
+    parser.add_argument('--workers', type=int, default=4, help="Cantidad de etapas en paralelo")
+    parser.add_argument('--memory-report', action='store_true', help="Mostrar la memoria de los DataFrames de cada etapa")
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                        help="Perfilar cada etapa de los loaders y guardar los reportes en DIR (ejecuta las etapas de a una)")
+    parser.add_argument('--dry-run', action='store_true', help="Solo informar qué loaders se ejecutarían")
+    parser.add_argument('--watch', nargs='?', type=float, const=POLL_INTERVAL, metavar='SECONDS',
+                        help="Revisar el directorio de datos cada SECONDS segundos y sincronizar cuando cambie")
+    parser.add_argument('--export', action='store_true',
+                        help="Después de cargar, exportar a Parquet las particiones que cambiaron")
+    args = parser.parse_args(argv)
+    if args.watch is not None and args.dry_run:
+        parser.error("--watch no se puede combinar con --dry-run")
+
+    stage_args = ['--memory-report'] if args.memory_report else []
+    # tracemalloc es global al proceso: con profiling las etapas no pueden correr en paralelo
+    workers = args.workers
+    if args.profile:
+        stage_args.extend(['--profile', args.profile])
+        workers = 1
+
+    if args.watch is not None:
+        watch(args.watch, workers, stage_args, export=args.export)
+        return 0
+    failed = sync_once(workers, stage_args, args.dry_run, export=args.export)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+from player_resolution import estimate_birth_years
+from franchises import resolve_franchises
+from validation import SEASON_RANGE
+import argparse
+import os
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+
+# Archivos fuente que leen los loaders (rutas relativas al directorio de datos)
+PLAYER_STATS_FILE = 'NBA_Player_Stats.csv'
+PLAYER_IDS_FILE = 'NBA_Player_IDs.csv'
+TEAM_STATS_FILE = 'NBA_Team_Stats.csv'
+FINALS_FILE = 'NBA Finals and MVP.xlsx'
+
+# Los NBAID sintéticos arrancan acá para no chocar con los reales
+SYNTHETIC_NBA_ID_START = 10_000_000
+
+# Jugadores sintéticos: nombre y apellido de jugadores reales elegidos al azar, así que hay
+# coincidencias de nombre entre ellos y con los reales (homónimos con distinto año de nacimiento)
+def synthetic_names(players, count, rng):
+    tokens = pd.Series(players).str.replace('*', '', regex=False).str.split()
+    first_names = tokens.str[0].to_numpy()
+    last_names = tokens.str[-1].to_numpy()
+    return pd.Series(first_names[rng.integers(len(first_names), size=count)]) + ' ' + \
+        pd.Series(last_names[rng.integers(len(last_names), size=count)])
+
+# Escalar las estadísticas y los IDs de jugadores: cada jugador sintético copia la carrera
+# de un jugador real (mismas temporadas, equipos y edades) con otro nombre y otro NBAID
+def scale_player_data(stats_df, ids_df, scale, rng):
+    if scale <= 1:
+        return stats_df, ids_df
+
+    players = stats_df['Player'].unique()
+    count = len(players) * (scale - 1)
+    synthetic = pd.DataFrame({
+        'template': players[rng.integers(len(players), size=count)],
+        'name': synthetic_names(players, count, rng),
+        'nba_id': np.arange(SYNTHETIC_NBA_ID_START, SYNTHETIC_NBA_ID_START + count),
+    })
+    # Los homónimos sintéticos se distinguen como en los datos reales: por el año de nacimiento
+    birth_years = estimate_birth_years(stats_df)
+    synthetic['birth_year'] = synthetic['template'].map(birth_years).round().astype('Int64')
+
+    rows = synthetic[['template', 'name']].merge(stats_df, left_on='template', right_on='Player')
+    rows['Player'] = rows['name']
+    # Un solo MVP por temporada: las copias nunca lo son
+    rows['MVP'] = False
+    stats = pd.concat([stats_df, rows[stats_df.columns]], ignore_index=True)
+    stats['Rk'] = np.arange(1, len(stats) + 1)
+
+    birth_dates = '1/1/' + synthetic['birth_year'].astype(str)
+    ids = pd.DataFrame({
+        'BBRefName': synthetic['name'],
+        'BBRefID': 'syn' + synthetic['nba_id'].astype(str),
+        'BBRefBirthDate': birth_dates,
+        # La variante de la NBA sin puntos, como en los datos reales (A.J. -> AJ)
+        'NBAName': synthetic['name'].str.replace('.', '', regex=False),
+        'NBAID': synthetic['nba_id'],
+        'NBABirthDate': birth_dates,
+    })
+    return stats, pd.concat([ids_df, ids.reindex(columns=ids_df.columns)], ignore_index=True)
+
+# Corrimientos de temporada de cada copia: bloques enteros del largo del período original, alternando
+# hacia atrás y hacia adelante, que entren en el rango de temporadas válido. Ese rango admite pocas copias
+# distintas: se devuelven a lo sumo tantas como entran (más copias repetirían la clave y no se cargarían)
+def season_offsets(first, last, copies):
+    span = last - first + 1
+    low, high = SEASON_RANGE
+    offsets = [
+        step * span
+        for distance in range(1, (high - low) // span + 1)
+        for step in (-distance, distance)
+        if low <= first + step * span and last + step * span <= high
+    ]
+    return offsets[:copies]
+
+# Escalar el CSV de equipos repitiendo las filas (se trabaja sobre el texto para conservar el formato).
+# Cada copia corre las temporadas para que la clave (equipo, temporada) no se repita y usa el nombre actual
+# de la franquicia, que vale en cualquier época. Cada copia empieza con el encabezado, como las
+# exportaciones que lo repiten en medio del archivo. Como las temporadas no alcanzan para todas las
+# copias, el archivo deja de crecer en el tope de 'season_offsets'. Devuelve la cantidad de filas escritas
+def scale_team_stats(source_path, target_path, scale):
+    with open(source_path) as f:
+        header, *rows = f.read().splitlines()
+    fields = [row.split(',') for row in rows]
+    starts = np.array([int(row[-1].split('-')[0]) for row in fields])
+    ends = np.array([int(row[-1].split('-')[1]) for row in fields])
+    teams = pd.Series([row[1] for row in fields])
+    franchises = resolve_franchises(teams, ends).fillna(teams)
+
+    lines = [header, *rows]
+    offsets = season_offsets(ends.min(), ends.max(), max(scale, 1) - 1)
+    for offset in offsets:
+        lines.append(header)
+        for row, franchise, start, end in zip(fields, franchises, starts, ends):
+            lines.append(','.join([row[0], franchise, *row[2:-1], f"{start + offset}-{end + offset}"]))
+    with open(target_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return len(rows) * (len(offsets) + 1)
+
+# Generar en 'target_dir' un juego de datos 'scale' veces más grande que el de 'source_dir'
+def generate_dataset(source_dir, target_dir, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    os.makedirs(target_dir, exist_ok=True)
+
+    stats_df = pd.read_csv(os.path.join(source_dir, PLAYER_STATS_FILE))
+    ids_df = pd.read_csv(os.path.join(source_dir, PLAYER_IDS_FILE), encoding='ISO-8859-1')
+    stats_df, ids_df = scale_player_data(stats_df, ids_df, scale, rng)
+    stats_df.to_csv(os.path.join(target_dir, PLAYER_STATS_FILE), index=False)
+    ids_df.to_csv(os.path.join(target_dir, PLAYER_IDS_FILE), index=False, encoding='ISO-8859-1', errors='replace')
+
+    team_rows = scale_team_stats(os.path.join(source_dir, TEAM_STATS_FILE), os.path.join(target_dir, TEAM_STATS_FILE), scale)
+    shutil.copyfile(os.path.join(source_dir, FINALS_FILE), os.path.join(target_dir, FINALS_FILE))
+
+    return {
+        PLAYER_STATS_FILE: len(stats_df),
+        PLAYER_IDS_FILE: len(ids_df),
+        TEAM_STATS_FILE: team_rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generar datos sintéticos escalados a partir de los CSV reales")
+    parser.add_argument('target_dir', help="Directorio donde se escriben los archivos generados")
+    parser.add_argument('--scale', type=int, default=10, help="Factor de escala (1 = copia de los datos reales)")
+    parser.add_argument('--source-dir', default='data', help="Directorio con los archivos originales")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    counts = generate_dataset(args.source_dir, args.target_dir, args.scale, args.seed)
+    for name, rows in counts.items():
+        print(f"{name}: {rows} filas")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,24 +1,25 @@
-from db_setup import get_db_session
+from sqlalchemy import inspect, text
+from db_setup import get_db_connection
 
 def test_connection():
     try:
-        # Obtener la conexión a la base de datos
-        engine = get_db_session()
+        # Obtener el engine de la base de datos
+        engine = get_db_connection()
 
         # Realizar una consulta simple
         with engine.connect() as connection:
             # Usamos text para pasar la consulta correctamente
-            result = connection.execute("SELECT FROM players")
-            tables = result.fetchall()
+            connection.execute(text("SELECT 1"))
+
+        # Mostrar las tablas disponibles
+        tables = inspect(engine).get_table_names()
+        if tables:
+            print("Tablas en la base de datos:")
+            for table in tables:
+                print(table)
+        else:
+            print("No se encontraron tablas en la base de datos.")
 
-            # Mostrar las tablas disponibles
-            if tables:
-                print("Tablas en la base de datos:")
-                for table in tables:
-                    print(table[0])
-            else:
-                print("No se encontraron tablas en la base de datos.")
-        
         print("Conexión exitosa.")
     except Exception as e:
         print(f"Error al conectar a la base de datos: {e}")
@@ -0,0 +1,107 @@
+from functools import lru_cache
+import argparse
+import unicodedata
+import numpy as np
+import pandas as pd
+from metrics import log_event
+
+# Reglas canónicas de normalización de nombres (las usan todos los loaders para que los joins coincidan):
+# minúsculas, sin acentos, sin puntos/apóstrofes y con espacios simples.
+# El asterisco (marca de Hall of Fame) se conserva porque distingue jugadores homónimos (Patrick Ewing*)
+_REMOVED_CHARS = "[.']"
+
+# Tabla de traducción para eliminar acentos (se completa a medida que aparecen caracteres nuevos)
+_ACCENT_TABLE = {}
+
+# Agregar a la tabla los caracteres no ASCII que todavía no se conocen
+def _update_accent_table(chars):
+    for char in chars:
+        if ord(char) > 127 and ord(char) not in _ACCENT_TABLE:
+            _ACCENT_TABLE[ord(char)] = unicodedata.normalize('NFKD', char).encode('ascii', 'ignore').decode('ascii')
+    return _ACCENT_TABLE
+
+# Eliminar acentos de una cadena usando la tabla de traducción
+def fold_accents(text):
+    if not text.isascii():
+        text = text.translate(_update_accent_table(set(text)))
+    return text
+
+@lru_cache(maxsize=65536)
+def _normalize_name_cached(name):
+    name = fold_accents(name.lower())
+    for char in ".'":
+        name = name.replace(char, '')
+    return ' '.join(name.split())
+
+# Normalizar un nombre (versión escalar, memoizada)
+def normalize_name(name):
+    if pd.isnull(name):
+        return ''
+    return _normalize_name_cached(str(name))
+
+# Normalizar una columna completa de nombres (una sola normalización por nombre único)
+def normalize_names(series):
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object).astype(str).str.lower()
+
+    # Eliminar acentos solo si hay caracteres no ASCII
+    non_ascii = ~uniques.map(str.isascii)
+    if non_ascii.any():
+        _update_accent_table(set(''.join(uniques[non_ascii])))
+        uniques[non_ascii] = uniques[non_ascii].str.translate(_ACCENT_TABLE)
+
+    uniques = (uniques.str.replace(_REMOVED_CHARS, '', regex=True)
+                      .str.replace(r'\s+', ' ', regex=True)
+                      .str.strip())
+
+    # Volver a expandir a todas las filas; los nulos (código -1) toman la cadena vacía del final
+    values = np.append(uniques.to_numpy(dtype=object), '')
+    return pd.Series(values[codes], index=series.index, name=series.name, dtype=object)
+
+# Construir los registros a insertar a partir de un mapeo declarativo de columnas:
+# {columna en la tabla: (columna en el DataFrame, tipo)}. El tipo None deja la columna como está.
+def build_frame(df, column_map):
+    frame = df[[source for source, _ in column_map.values()]]
+    frame.columns = list(column_map)
+    casts = {column: dtype for column, (_, dtype) in column_map.items() if dtype is not None}
+    # Las columnas float32 se amplían conservando el valor decimal leído de la fuente
+    for column, dtype in list(casts.items()):
+        if dtype == 'float64' and frame[column].dtype == np.float32:
+            frame[column] = widen_float32(frame[column])
+            del casts[column]
+    return frame.astype(casts)
+
+# Pasar una columna float32 a float64 sin arrastrar el error de representación
+# (0.377 en float32 -> 0.377 y no 0.3770000040531158)
+# Las estadísticas repiten pocos valores distintos: se convierte una vez cada valor único
+def widen_float32(series):
+    codes, uniques = pd.factorize(series.to_numpy(dtype=np.float32))
+    values = np.append(uniques.astype(str).astype(np.float64), np.nan)
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+# Memoria (en MB, contando el contenido de los textos) de los DataFrames de una etapa
+def log_memory_report(stage, frames):
+    sizes = {name: df.memory_usage(deep=True).sum() for name, df in frames.items()}
+    log_event('memory', stage=stage, total_mb=round(sum(sizes.values()) / 2**20, 2), frames={
+        name: {'rows': len(df), 'columns': df.shape[1], 'mb': round(sizes[name] / 2**20, 2)}
+        for name, df in frames.items()
+    })
+
+# Convertir el DataFrame en una lista de diccionarios (los NaN se insertan como NULL)
+def frame_to_records(frame):
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict('records')
+
+def build_records(df, column_map):
+    return frame_to_records(build_frame(df, column_map))
+
+# Parser de argumentos común a todos los loaders
+def get_loader_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--incremental', action='store_true',
+                        help="Insertar solo filas nuevas y actualizar las modificadas (por clave natural)")
+    parser.add_argument('--memory-report', action='store_true',
+                        help="Mostrar la memoria usada por los DataFrames de la etapa")
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIR',
+                        help="Perfilar cada etapa (cProfile y tracemalloc) y guardar los reportes en DIR")
+    return parser
@@ -0,0 +1,163 @@
+from incremental import NATURAL_KEYS
+from metrics import log_event, write_rejects
+import numpy as np
+import pandas as pd
+import logging
+
+# Las estadísticas por partido vienen redondeadas a un decimal: un porcentaje es coherente con
+# sus convertidos/intentados si cae entre los cocientes posibles antes de redondear
+STAT_ROUNDING = 0.05
+
+# Tolerancia del porcentaje, que viene redondeado a tres decimales
+PERCENTAGE_ROUNDING = 0.0005
+
+# Temporadas válidas (año de finalización)
+SEASON_RANGE = (1947, 2100)
+
+# Reglas de validación de cada tabla, evaluadas sobre columnas enteras antes de insertar:
+#   ('required', columnas)                      sin nulos
+#   ('range', columna, mínimo, máximo)          los nulos se aceptan (solo 'required' los rechaza)
+#   ('not_greater', columna, otra)              columna <= otra
+#   ('ratio', convertidos, intentados, porcentaje, redondeo)
+#   ('unique', columnas)                        clave sin repetir (se queda la última, como el upsert)
+PERCENTAGES = ['fg_percentage', 'three_p_percentage', 'two_p_percentage', 'efg_percentage', 'ft_percentage']
+PLAYER_COUNTING_STATS = [
+    'minutes_played', 'fg', 'fga', 'three_points', 'three_pa', 'two_points', 'two_pa', 'ft', 'fta',
+    'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pts',
+]
+TEAM_COUNTING_STATS = ['fg', 'fga', 'three_points', 'three_pa', 'ft', 'fta', 'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pts']
+
+VALIDATION_RULES = {
+    'players_stats': [
+        ('required', ['id_player', 'season', 'team', 'games']),
+        ('range', 'season', *SEASON_RANGE),
+        ('range', 'games', 1, 90),
+        ('range', 'minutes_played', 0, 60),
+        *[('range', column, 0, None) for column in PLAYER_COUNTING_STATS],
+        *[('range', column, 0, 1.5 if column == 'efg_percentage' else 1) for column in PERCENTAGES],
+        ('not_greater', 'games_started', 'games'),
+        ('not_greater', 'fg', 'fga'),
+        ('not_greater', 'three_points', 'three_pa'),
+        ('not_greater', 'two_points', 'two_pa'),
+        ('not_greater', 'ft', 'fta'),
+        ('ratio', 'fg', 'fga', 'fg_percentage', STAT_ROUNDING),
+        ('ratio', 'three_points', 'three_pa', 'three_p_percentage', STAT_ROUNDING),
+        ('ratio', 'two_points', 'two_pa', 'two_p_percentage', STAT_ROUNDING),
+        ('ratio', 'ft', 'fta', 'ft_percentage', STAT_ROUNDING),
+        ('unique', NATURAL_KEYS['players_stats']),
+    ],
+    'teams_stats': [
+        ('required', ['idteam', 'year', 'games', 'fg', 'fga', 'pts']),
+        ('range', 'year', *SEASON_RANGE),
+        ('range', 'games', 1, 110),
+        *[('range', column, 0, None) for column in TEAM_COUNTING_STATS],
+        *[('range', column, 0, 1) for column in ['fg_percentage', 'three_p_percentage', 'ft_percentage']],
+        ('not_greater', 'fg', 'fga'),
+        ('not_greater', 'three_points', 'three_pa'),
+        ('not_greater', 'ft', 'fta'),
+        ('ratio', 'fg', 'fga', 'fg_percentage', STAT_ROUNDING),
+        ('ratio', 'three_points', 'three_pa', 'three_p_percentage', STAT_ROUNDING),
+        ('ratio', 'ft', 'fta', 'ft_percentage', STAT_ROUNDING),
+        ('unique', NATURAL_KEYS['teams_stats']),
+    ],
+    'mvp': [
+        ('required', ['idplayer', 'year']),
+        ('range', 'year', *SEASON_RANGE),
+        ('unique', NATURAL_KEYS['mvp']),
+    ],
+    'nba_champions': [
+        ('required', ['idteam', 'year']),
+        ('range', 'year', *SEASON_RANGE),
+        ('unique', NATURAL_KEYS['nba_champions']),
+    ],
+    'conference_champions': [
+        ('required', ['idteam', 'year', 'conference']),
+        ('range', 'year', *SEASON_RANGE),
+        ('unique', NATURAL_KEYS['conference_champions']),
+    ],
+}
+
+# Valores de una columna numérica como float64 de NumPy (los nulos quedan como NaN)
+def column_values(frame, column):
+    return pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+# Cada chequeo devuelve una máscara booleana con las filas que violan la regla
+def check_required(frame, columns):
+    return frame[columns].isna().to_numpy().any(axis=1)
+
+def check_range(frame, column, low=None, high=None):
+    values = column_values(frame, column)
+    violations = np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        if low is not None:
+            violations |= values < low
+        if high is not None:
+            violations |= values > high
+    return violations
+
+def check_not_greater(frame, column, other):
+    with np.errstate(invalid='ignore'):
+        return column_values(frame, column) > column_values(frame, other)
+
+# El porcentaje tiene que estar entre el menor y el mayor cociente posibles de los valores sin redondear
+def check_ratio(frame, made, attempted, percentage, rounding):
+    made = column_values(frame, made)
+    attempted = column_values(frame, attempted)
+    percentage = column_values(frame, percentage)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        low = np.maximum(made - rounding, 0) / (attempted + rounding)
+        high = np.where(attempted > rounding, (made + rounding) / (attempted - rounding), np.inf)
+        violations = (percentage < low - PERCENTAGE_ROUNDING) | (percentage > high + PERCENTAGE_ROUNDING)
+    # Sin intentos (o sin porcentaje) no hay nada que comparar
+    return violations & (attempted > 0) & ~np.isnan(percentage)
+
+def check_unique(frame, columns):
+    return frame.duplicated(subset=columns, keep='last').to_numpy()
+
+CHECKS = {
+    'required': check_required,
+    'range': check_range,
+    'not_greater': check_not_greater,
+    'ratio': check_ratio,
+    'unique': check_unique,
+}
+
+# Nombre legible de una regla para los conteos y los rechazos
+def rule_name(rule):
+    kind, *args = rule
+    if kind == 'not_greater':
+        return f"{args[0]}<={args[1]}"
+    if kind == 'ratio':
+        return f"ratio:{args[2]}"
+    columns = args[0] if isinstance(args[0], list) else [args[0]]
+    return f"{kind}:{','.join(columns)}"
+
+# Evaluar las reglas de la tabla. Devuelve las filas válidas, las que fallan (con las reglas que
+# violan en la columna 'rule') y la cantidad de violaciones de cada regla
+def validate_frame(frame, table_name, rules=None):
+    rules = VALIDATION_RULES.get(table_name, []) if rules is None else rules
+    failed = np.zeros(len(frame), dtype=bool)
+    masks = {}
+    for rule in rules:
+        kind, *args = rule
+        mask = CHECKS[kind](frame, *args)
+        masks[rule_name(rule)] = mask
+        failed |= mask
+
+    counts = {name: int(mask.sum()) for name, mask in masks.items()}
+    invalid = frame[failed]
+    if failed.any():
+        names = np.array(list(masks))
+        matrix = np.column_stack([mask[failed] for mask in masks.values()])
+        invalid = invalid.assign(rule=[';'.join(names[row]) for row in matrix])
+    return frame[~failed], invalid, counts
+
+# Etapa de validación de un loader: separar las filas inválidas, guardarlas como rechazos
+# (motivo 'validation_failed') y registrar las violaciones por regla
+def validate_payload(loader, table_name, frame):
+    valid, invalid, counts = validate_frame(frame, table_name)
+    violations = {name: count for name, count in counts.items() if count}
+    log_event('validation', level=logging.WARNING if violations else logging.INFO, loader=loader,
+              table=table_name, rows=len(frame), invalid=len(invalid), rules=len(counts), violations=violations)
+    write_rejects(loader, invalid, 'validation_failed')
+    return valid